@@ -0,0 +1,208 @@
+from functools import lru_cache
+
+from metrics import null_span
+from palette_index import select_colors
+from slug import make_valid_url, slug_matrix
+
+BASE_URL = "https://floor-and-design.fr/wp-content/uploads"
+
+# Offsets inside a configurator's block of image IDs
+GROUP_LAYER_OFFSET = 10
+CHILD_OFFSET = 15
+
+STYLE_MAP = {
+    "Style 1": "style-1",
+    "Style 2": "style-2",
+    "Style 3": "style-3",
+    "Accordion Style 1": "accordion-1",
+    "Accordion Style 2": "accordion-2",
+    "Popover": "popover_value"
+}
+
+
+def product_url(date, motif, motif_num):
+    return f"{BASE_URL}/{date}/" + make_valid_url(f"{motif}-{motif_num}")
+
+
+def build_section_entry(index, motif, motif_num, date, width, height, product_type, colors=""):
+    return {
+        "Section No": f"Section {index+1}",
+        "Custom Class": f"productGroup group{index+1}",
+        "Width": width,
+        "Height": height,
+        "Product Type": product_type,
+        "Product URL": product_url(date, motif, motif_num),
+        "Motif": motif,
+        "Motif No": motif_num,
+        "Date": date,
+        "Colors": colors,  # palette query, see palette_index.parse_query; blank = every color
+    }
+
+
+def block_size(section_count, color_count):
+    # Number of image IDs one configurator consumes, group layer included
+    return CHILD_OFFSET + section_count * color_count
+
+
+def section_color_counts(sections, couleur_rgba_dict):
+    return [len(select_colors(couleur_rgba_dict, section.get("Colors"))) for section in sections]
+
+
+def sections_block_size(sections, couleur_rgba_dict):
+    # Like block_size, for sections that may each use a subset of the palette
+    return CHILD_OFFSET + sum(section_color_counts(sections, couleur_rgba_dict))
+
+
+def build_group_layer_image(data, image_counter):
+    return {
+        "image_id": image_counter + GROUP_LAYER_OFFSET,
+        "src": data["Group Layer Image URL"],
+        "width": 2437,
+        "height": 2560
+    }
+
+
+class ChildImage:
+    """One color image of a section.
+
+    Only the fields that differ between images are stored. Item access
+    (``img["src"]``, ``img.get("uid")``) works as it did on the former dicts.
+    """
+
+    __slots__ = ("image_id", "src", "width", "height", "color", "couleur", "uid")
+
+    def __init__(self, image_id, src, width, height, color, couleur=None, uid=None):
+        self.image_id = image_id
+        self.src = src
+        self.width = width
+        self.height = height
+        self.color = color
+        self.couleur = couleur
+        self.uid = uid
+
+    @classmethod
+    def from_dict(cls, img):
+        # Children in the former dict shape; couleur and uid may be missing
+        return cls(img.get("image_id"), img.get("src"), img.get("width"), img.get("height"), img.get("color"),
+                   img.get("couleur"), img.get("uid"))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key) is not None}
+
+    def __repr__(self):
+        return f"ChildImage({self.to_dict()!r})"
+
+
+class PaletteTemplate:
+    """A palette compiled once for stamping section children.
+
+    Color order, RGBA values and the file name suffix of every color for
+    each product type are computed here, so stamping a section only fills
+    in the image ID, URL and size of each child.
+    """
+
+    __slots__ = ("couleurs", "rgbas", "_suffixes")
+
+    def __init__(self, colors):
+        self.couleurs = tuple(couleur for couleur, rgba in colors)
+        self.rgbas = tuple(rgba for couleur, rgba in colors)
+        self._suffixes = {}
+
+    def __len__(self):
+        return len(self.couleurs)
+
+    def suffixes(self, product_type):
+        suffixes = self._suffixes.get(product_type)
+        if suffixes is None:
+            suffixes = self._suffixes[product_type] = tuple(slug_matrix(self.couleurs, [product_type])[product_type])
+        return suffixes
+
+    def stamp(self, section, image_counter):
+        """Return the section's children, numbered from ``image_counter + CHILD_OFFSET``."""
+        base = section["Product URL"]
+        width = section["Width"]
+        height = section["Height"]
+        first_id = image_counter + CHILD_OFFSET
+        return [
+            ChildImage(first_id + offset, f"{base}{suffix}.png", width, height, rgba, couleur)
+            for offset, (couleur, rgba, suffix)
+            in enumerate(zip(self.couleurs, self.rgbas, self.suffixes(section["Product Type"])))
+        ]
+
+
+@lru_cache(maxsize=64)
+def _compile(colors):
+    return PaletteTemplate(colors)
+
+
+def compile_palette(couleur_rgba_dict):
+    """Return the shared :class:`PaletteTemplate` for a ``{couleur: rgba}`` mapping."""
+    return _compile(tuple(couleur_rgba_dict.items()))
+
+
+def _section_data(section, couleur_rgba_dict, image_counter):
+    # -> (generator input for one section, number of image IDs it uses)
+    template = compile_palette(select_colors(couleur_rgba_dict, section.get("Colors")))
+    return {
+        "name": section["Section No"],
+        "custom_class": section["Custom Class"],
+        "children": template.stamp(section, image_counter),
+    }, len(template)
+
+
+def build_sections_data(sections, couleur_rgba_dict, image_counter):
+    sections_data = []
+
+    for section in sections:
+        section_data, count = _section_data(section, couleur_rgba_dict, image_counter)
+        sections_data.append(section_data)
+        image_counter += count
+
+    return sections_data, image_counter
+
+
+class LazySections:
+    """The sections of :func:`build_sections_data`, built only as iteration reaches them.
+
+    Each pass builds the sections again and drops them behind it, so a
+    streamed write holds one section at a time. ``prepare(section)`` runs
+    on every section as it is built, e.g. to fill in probed image sizes.
+    """
+
+    def __init__(self, sections, couleur_rgba_dict, image_counter, prepare=None, span=null_span):
+        self.sections = sections
+        self.couleur_rgba_dict = couleur_rgba_dict
+        self.image_counter = image_counter
+        self.prepare = prepare
+        self.span = span
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __iter__(self):
+        image_counter = self.image_counter
+        for section in self.sections:
+            with self.span("section assembly"):
+                section_data, count = _section_data(section, self.couleur_rgba_dict, image_counter)
+            image_counter += count
+            if self.prepare:
+                self.prepare(section_data)
+            yield section_data
@@ -0,0 +1,306 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from read_color import get_palette
+from generate_json import ConfiguratorJSONGenerator
+from image_ids import ImageIdAllocator, IMAGE_ID_RECORD
+from assemble import (STYLE_MAP, build_section_entry, sections_block_size,
+                      build_group_layer_image, LazySections)
+from slug import make_valid_url
+from palette_index import check_selection, parse_query
+from metrics import RunMetrics, span_for
+from uids import UID_PROVIDERS, make_uid_provider
+from verify_assets import AssetVerifier, collect_image_urls, describe_missing
+from png_probe import PngProbe
+from log_setup import setup_logging
+from shards import index_path, parse_size
+from publish import PUBLISH_JOURNAL, PUBLISH_URL_ENV, Publisher, auth_from_env, describe_failed
+
+CORRESPONDANCE_RGBA_DIR = "../correspondance_rgba.csv"
+
+CONFIGURATOR_COLUMNS = ["name", "style", "base_price", "group_layer_url", "custom_css", "custom_js", "form"]
+SECTION_COLUMNS = ["motif", "motif_num", "date", "width", "height", "product_type", "colors"]
+
+SECTION_DEFAULTS = {
+    "motif_num": "Background",
+    "product_type": "Produit",
+}
+
+
+def _read_json_manifest(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        rows = json.load(f)
+    if isinstance(rows, dict):
+        rows = rows.get("configurators", [])
+    return rows
+
+
+def _read_csv_manifest(path, delimiter):
+    # One row per section; configurator columns are repeated on each row
+    configurators = {}
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        for line_no, row in enumerate(reader, start=2):
+            name = (row.get("name") or "").strip()
+            if not name:
+                raise ValueError(f"{path}:{line_no}: missing configurator name")
+            entry = configurators.setdefault(name, {"name": name, "sections": []})
+            for column in CONFIGURATOR_COLUMNS:
+                value = (row.get(column) or "").strip()
+                if value and not entry.get(column):
+                    entry[column] = value
+            section = {column: (row.get(column) or "").strip() for column in SECTION_COLUMNS}
+            if any(section.values()):
+                entry["sections"].append(section)
+    return list(configurators.values())
+
+
+def load_manifest(path, delimiter=';', couleur_rgba_dict=None):
+    if path.lower().endswith(".json"):
+        rows = _read_json_manifest(path)
+    else:
+        rows = _read_csv_manifest(path, delimiter)
+    return [manifest_row_to_form_data(row, couleur_rgba_dict) for row in rows]
+
+
+def manifest_row_to_form_data(row, couleur_rgba_dict=None):
+    """Turn a manifest entry into form data; with a palette, color queries must select at least one color."""
+    name = str(row.get("name", "")).strip()
+    if not name:
+        raise ValueError("Manifest entry without a name")
+
+    style = row.get("style") or "Accordion Style 2"
+    form = row.get("form") or "Cart Form"
+
+    sections = []
+    for i, section in enumerate(row.get("sections") or []):
+        values = {key: str(section.get(key) or SECTION_DEFAULTS.get(key, "")).strip() for key in SECTION_COLUMNS}
+        if not values["motif"] or not values["date"]:
+            raise ValueError(f"{name}: section {i+1} needs a motif and a date")
+        try:
+            parse_query(values["colors"])
+            if couleur_rgba_dict is not None:
+                check_selection(couleur_rgba_dict, values["colors"])
+        except ValueError as e:
+            raise ValueError(f"{name}: section {i+1}: {e}")
+        sections.append(build_section_entry(i, **values))
+
+    return {
+        "Configurator Name": name,
+        "Style": STYLE_MAP.get(style, style),
+        "Custom CSS": row.get("custom_css", ""),
+        "Custom JS": row.get("custom_js", ""),
+        "Form": form.replace(" ", "-").lower(),
+        "Base Price": str(row.get("base_price", "")),
+        "Required": True,
+        "Hide Control": True,
+        "Group Layer Image URL": row.get("group_layer_url", ""),
+        "Sections": sections,
+    }
+
+
+def build_configurator(data, image_counter, palette_path, output_path, indent=2, metrics_path=None, profile=False,
+                       uid_mode="random", verify=False, uploads_mirror=None, max_bytes=None):
+    metrics = None
+    if metrics_path or profile:
+        metrics = RunMetrics(data["Configurator Name"], profile=profile,
+                             profile_path=os.path.splitext(output_path)[0] + ".prof" if profile else None).start()
+    span = span_for(metrics)
+
+    with span("palette load"):
+        palette = get_palette(palette_path)
+    if not len(palette):
+        raise ValueError(f"No colors read from {palette_path}")
+
+    probe = PngProbe(uploads_mirror) if uploads_mirror else None
+    unprobed = []
+
+    def prepare(section):
+        with span("dimension probe"):
+            unprobed.extend(probe.fill_dimensions(None, [section], warn=False))
+
+    # Sections are built while the output is written and dropped once serialized
+    group_layer_image = build_group_layer_image(data, image_counter)
+    sections_data = LazySections(data["Sections"], palette.lookup, image_counter,
+                                 prepare=prepare if probe else None, span=span)
+    if probe:
+        with span("dimension probe"):
+            unprobed.extend(probe.fill_dimensions(group_layer_image, [], warn=False))
+
+    if verify:
+        with span("asset verification"):
+            missing = AssetVerifier().missing(collect_image_urls(group_layer_image, sections_data))
+        if missing:
+            raise ValueError(describe_missing(missing))
+
+    generator = ConfiguratorJSONGenerator(
+        title=data["Configurator Name"],
+        base_price=data["Base Price"],
+        config_style=data["Style"],
+        custom_js=data["Custom JS"],
+        custom_css=data["Custom CSS"],
+        form=data["Form"],
+        group_layer_image=group_layer_image,
+        sections_data=sections_data,
+        metrics=metrics,
+        uid_provider=make_uid_provider(uid_mode)
+    )
+    # Nothing reads the document back after the write, so built sections are not kept
+    if max_bytes:
+        generator.save_sharded(output_path, max_bytes, indent=indent, keep_parts=False)
+        output_path = index_path(output_path)
+    else:
+        generator.save_to_file(output_path, stream=True, indent=indent, keep_parts=False)
+
+    if probe:
+        probe.report_missing(unprobed)
+
+    if metrics:
+        metrics.finish()
+        if metrics_path:
+            metrics.write_jsonl(metrics_path)
+    return output_path
+
+
+def run_batch(manifest_path, output_dir, workers=None, palette_path=CORRESPONDANCE_RGBA_DIR,
+              record_path=IMAGE_ID_RECORD, delimiter=';', indent=2, metrics_path=None, profile=False,
+              uid_mode="random", verify=False, uploads_mirror=None, max_bytes=None):
+    """Build every configurator of the manifest.
+
+    Returns ``(written, failed)``: the output paths, and ``{name: error}``
+    for the configurators that could not be built.
+    """
+    palette = get_palette(palette_path)
+    if not len(palette):
+        raise ValueError(f"No colors read from {palette_path}")
+
+    configurators = load_manifest(manifest_path, delimiter=delimiter, couleur_rgba_dict=palette.lookup)
+    if not configurators:
+        logging.warning(f"No configurators found in {manifest_path}")
+        return [], {}
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    file_names = []
+    for data in configurators:
+        file_name = make_valid_url(data["Configurator Name"]) + ".json"
+        if file_name in file_names:
+            raise ValueError(f"Duplicate configurator name in manifest: {data['Configurator Name']}")
+        file_names.append(file_name)
+
+    written = []
+    failed = {}
+    if verify:
+        # Checked here, before any IDs are reserved, so a skipped configurator does not burn its block.
+        # URLs do not depend on image IDs, so the sections are assembled from ID 0.
+        urls = {data["Configurator Name"]: collect_image_urls(build_group_layer_image(data, 0),
+                                                              LazySections(data["Sections"], palette.lookup, 0))
+                for data in configurators}
+        missing = AssetVerifier().missing(url for name_urls in urls.values() for url in name_urls)
+        passed = []
+        for data, file_name in zip(configurators, file_names):
+            name = data["Configurator Name"]
+            name_missing = {url: missing[url] for url in urls[name] if url in missing}
+            if name_missing:
+                failed[name] = describe_missing(name_missing)
+                logging.error(f"Skipping configurator {name}: {failed[name]}")
+            else:
+                passed.append((data, file_name))
+        configurators, file_names = [data for data, file_name in passed], [file_name for data, file_name in passed]
+
+    # Reserve one contiguous, non-overlapping block of image IDs per configurator in one write
+    starts = ImageIdAllocator(record_path).reserve_blocks(
+        [sections_block_size(data["Sections"], palette.lookup) for data in configurators]
+    ) if configurators else []
+    jobs = [
+        (data, start, palette_path, os.path.join(output_dir, file_name), indent, metrics_path, profile, uid_mode, False,
+         uploads_mirror, max_bytes)
+        for data, start, file_name in zip(configurators, starts, file_names)
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(build_configurator, *job): job[0]["Configurator Name"] for job in jobs}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                written.append(future.result())
+                logging.info(f"Built configurator {name}")
+            except Exception as e:
+                failed[name] = str(e)
+                logging.error(f"Error building configurator {name}: {e}")
+
+    print(f"✅ {len(written)} configurators written to {output_dir}" + (f", {len(failed)} failed" if failed else ""))
+    return written, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build configurator JSON files from a manifest without the GUI.")
+    parser.add_argument("manifest", help="CSV (one row per section) or JSON manifest")
+    parser.add_argument("-o", "--output-dir", default="configurators", help="Directory for the generated JSON files")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--palette", default=CORRESPONDANCE_RGBA_DIR, help="Palette CSV with Couleur and RGBA columns")
+    parser.add_argument("--record", default=IMAGE_ID_RECORD, help="Image ID last record file")
+    parser.add_argument("--delimiter", default=";", help="CSV manifest delimiter")
+    parser.add_argument("--compact", action="store_true", help="Write compact JSON without indentation")
+    parser.add_argument("--metrics", default=None, help="Append per-stage timings for each configurator to this JSON lines file")
+    parser.add_argument("--profile", action="store_true", help="Write a cProfile .prof file next to each configurator")
+    parser.add_argument("--uids", choices=sorted(UID_PROVIDERS), default="random",
+                        help="UID mode; 'deterministic' derives UIDs from title, section and color")
+    parser.add_argument("--verify", action="store_true", help="HEAD-check every image URL and skip configurators with missing images")
+    parser.add_argument("--uploads-mirror", default=None,
+                        help="Local copy of wp-content/uploads; image sizes are read from the PNG headers")
+    parser.add_argument("--max-bytes", type=parse_size, default=None,
+                        help="Split each configurator into shards of at most this size (e.g. 2M, 500K) plus an index")
+    parser.add_argument("--publish", nargs="?", const="", default=None, metavar="ENDPOINT",
+                        help=f"POST the built configurators to this WordPress REST endpoint (default: ${PUBLISH_URL_ENV}); "
+                             f"finished uploads are journaled in the output directory, so a rerun resumes")
+    parser.add_argument("--publish-concurrency", type=int, default=4, help="Uploads running at once")
+    args = parser.parse_args(argv)
+
+    setup_logging(log_file=None, console=True)
+
+    endpoint = None
+    if args.publish is not None:
+        endpoint = args.publish or os.environ.get(PUBLISH_URL_ENV)
+        if not endpoint:
+            logging.error(f"No publish endpoint: pass --publish URL or set {PUBLISH_URL_ENV}")
+            return 2
+
+    try:
+        written, build_failed = run_batch(args.manifest, args.output_dir, workers=args.workers, palette_path=args.palette,
+                  record_path=args.record, delimiter=args.delimiter,
+                  indent=None if args.compact else 2, metrics_path=args.metrics, profile=args.profile,
+                  uid_mode=args.uids, verify=args.verify, uploads_mirror=args.uploads_mirror,
+                  max_bytes=args.max_bytes)
+    except Exception as e:
+        logging.error(f"Batch failed: {e}")
+        return 1
+
+    if endpoint and written:
+        try:
+            journal = os.path.join(args.output_dir, PUBLISH_JOURNAL)
+            publisher = Publisher(endpoint, auth=auth_from_env(), concurrency=args.publish_concurrency,
+                                  journal_path=journal)
+            failed = publisher.failed(written)
+        except Exception as e:
+            logging.error(f"Publish failed: {e}")
+            return 1
+        if failed:
+            # Rebuilding would draw new image IDs; publish.py resumes from the same journal instead
+            logging.error(describe_failed(failed) + f"\nRetry with: python publish.py --endpoint {endpoint} "
+                          f"--journal {journal} " + " ".join(written))
+            return 1
+        print(f"✅ {len(written)} configurators published to {endpoint}")
+    if build_failed:
+        logging.error(f"{len(build_failed)} configurator(s) failed to build: {', '.join(build_failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
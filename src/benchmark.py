@@ -0,0 +1,233 @@
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import read_color
+import slug
+from read_color import read_color_csv, get_palette
+from generate_json import ConfiguratorJSONGenerator
+from assemble import build_section_entry, build_group_layer_image, build_sections_data
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+PALETTE_SIZES = [200, 2000, 20000]
+SECTION_COUNTS = [1, 50, 500]
+GENERATOR_PALETTE_SIZE = 194
+REGRESSION_THRESHOLD = 1.25
+
+FAMILIES = ["Bleu", "Gris", "Jaune", "Ocre", "Rouge", "Terre", "Vert", "Noir", "Blanc", "Brun"]
+SHADES = ["Canard", "Charette", "Lavande", "Outremer", "Etain", "Indien", "Anthracite", "Ardoise", "Citron", "Pistache"]
+WEIGHTS = [1, 2, 3, 5, 7, 10, 12, 15, 17]
+
+
+def synthetic_palette(path, size, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(["Couleur", "Code", "RGBA"])
+        for i in range(size):
+            r, g, b = rng.randrange(256), rng.randrange(256), rng.randrange(256)
+            name = f"{rng.choice(FAMILIES)}-{rng.choice(SHADES)}-{i}-{rng.choice(WEIGHTS)}g"
+            writer.writerow([name, f"#{r:02X}{g:02X}{b:02X}", f"rgba({r}, {g}, {b}, 1.0)"])
+    return path
+
+
+def synthetic_sections(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        build_section_entry(
+            i,
+            motif=str(rng.randrange(1, 40)),
+            motif_num=rng.choice(["Background", "Motif 1", "Motif 2", "Motif 3"]),
+            date=f"2025/{rng.randrange(1, 13):02d}",
+            width="1000",
+            height="900",
+            product_type=rng.choice(["Produit", "Frise", "Frise Content", "Frise Border"]),
+        )
+        for i in range(count)
+    ]
+
+
+def synthetic_form_data(section_count):
+    return {
+        "Configurator Name": "benchmark",
+        "Style": "accordion-2",
+        "Custom CSS": "",
+        "Custom JS": "",
+        "Form": "cart-form",
+        "Base Price": "15",
+        "Required": True,
+        "Hide Control": True,
+        "Group Layer Image URL": "https://floor-and-design.fr/wp-content/uploads/2025/08/group.png",
+        "Sections": synthetic_sections(section_count),
+    }
+
+
+def make_generator(section_count, palette):
+    data = synthetic_form_data(section_count)
+    group_layer_image = build_group_layer_image(data, 1000)
+    sections_data, image_counter = build_sections_data(data["Sections"], palette.lookup, 1000)
+    return ConfiguratorJSONGenerator(
+        title=data["Configurator Name"],
+        base_price=data["Base Price"],
+        config_style=data["Style"],
+        custom_js=data["Custom JS"],
+        custom_css=data["Custom CSS"],
+        form=data["Form"],
+        group_layer_image=group_layer_image,
+        sections_data=sections_data
+    )
+
+
+def measure(func, setup=None, repeat=3):
+    """Return (best seconds, peak traced bytes) for ``func(setup())``."""
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+
+    arg = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def build_cases(workdir, palette_sizes, section_counts):
+    cases = []
+
+    for size in palette_sizes:
+        path = synthetic_palette(os.path.join(workdir, f"palette_{size}.csv"), size)
+
+        def cold_read(arg, path=path):
+            read_color._palette_cache.clear()
+            read_color_csv(path)
+
+        def warm_read(arg, path=path):
+            read_color_csv(path)
+
+        cases.append((f"read_color_csv cold [{size} colors]", cold_read, None))
+        cases.append((f"read_color_csv warm [{size} colors]", warm_read, None))
+
+    names = [f"-{name}-Produit" for name in get_palette(synthetic_palette(
+        os.path.join(workdir, "palette_slug.csv"), 2000)).names]
+
+    def slug_cold(arg):
+        slug._slugify.cache_clear()
+        for name in names:
+            slug.make_valid_url(name)
+
+    def slug_warm(arg):
+        for name in names:
+            slug.make_valid_url(name)
+
+    cases.append((f"make_valid_url cold [{len(names)} names]", slug_cold, None))
+    cases.append((f"make_valid_url warm [{len(names)} names]", slug_warm, None))
+
+    palette = get_palette(synthetic_palette(os.path.join(workdir, "palette_gen.csv"), GENERATOR_PALETTE_SIZE))
+    output = os.path.join(workdir, "configurator.json")
+
+    for count in section_counts:
+        def assemble(arg, count=count):
+            data = synthetic_form_data(count)
+            build_group_layer_image(data, 1000)
+            build_sections_data(data["Sections"], palette.lookup, 1000)
+
+        def setup(count=count):
+            return make_generator(count, palette)
+
+        cases.append((f"submit_form assembly [{count} sections]", assemble, None))
+        cases.append((f"generate [{count} sections]", lambda generator: generator.generate(), setup))
+        cases.append((f"save_to_file [{count} sections]", lambda generator: generator.save_to_file(output), setup))
+        cases.append((f"save_to_file stream [{count} sections]",
+                      lambda generator: generator.save_to_file(output, stream=True, keep_parts=False), setup))
+
+    return cases
+
+
+def run(palette_sizes=PALETTE_SIZES, section_counts=SECTION_COUNTS, repeat=3):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, func, setup in build_cases(workdir, palette_sizes, section_counts):
+            seconds, peak = measure(func, setup, repeat=repeat)
+            results[name] = {"seconds": seconds, "peak_bytes": peak}
+    return results
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def report(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    print(f"{'stage':<45} {'time (ms)':>10} {'peak (KB)':>10} {'vs base':>8}")
+    for name, result in results.items():
+        line = f"{name:<45} {result['seconds'] * 1000:>10.2f} {result['peak_bytes'] / 1024:>10.1f}"
+        base = baseline.get(name)
+        if base and base["seconds"] > 0:
+            ratio = result["seconds"] / base["seconds"]
+            line += f" {ratio:>7.2f}x"
+            if ratio > threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the configurator generation pipeline.")
+    parser.add_argument("--quick", action="store_true", help="Only run the smallest palette and section sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best is kept)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown ratio reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    args = parser.parse_args(argv)
+
+    palette_sizes = PALETTE_SIZES[:1] if args.quick else PALETTE_SIZES
+    section_counts = SECTION_COUNTS[:2] if args.quick else SECTION_COUNTS
+
+    # Keep the generator's "JSON saved" prints out of the report
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        results = run(palette_sizes, section_counts, repeat=args.repeat)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    regressions = report(results, load_baseline(args.baseline), threshold=args.threshold)
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} stage(s) slower than {args.threshold}x baseline")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+
+BUILD_CACHE_DIR = "build_cache"
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+MAX_CACHE_ENTRIES = 64
+ENTRY_FILE = "entry.json"
+
+# Modules whose code shapes the output; changing any of them invalidates every cached build
+GENERATOR_MODULES = ("generate_json", "assemble", "uids", "palette_index", "read_color", "shards", "slug",
+                     "png_probe")
+
+
+@lru_cache(maxsize=16)
+def _file_digest(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, recomputed only when its size or mtime changes."""
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=1)
+def generator_version():
+    folder = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in GENERATOR_MODULES:
+        digest.update(file_digest(os.path.join(folder, name + ".py")).encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+def build_key(data, palette_path, **options):
+    """Cache key for a build of form ``data`` with ``palette_path``.
+
+    The form is serialized canonically (sorted keys, fixed separators), so
+    only a change that can alter the output changes the key. ``options``
+    are the build settings that are not part of the form, e.g. sharding,
+    and whether the images were verified.
+    """
+    payload = json.dumps({
+        "form": data,
+        "options": options,
+        "palette": file_digest(palette_path),
+        "generator": generator_version(),
+    }, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class BuildCache:
+    """Finished builds stored by :func:`build_key`.
+
+    Each entry is a folder holding the output files and ``entry.json``,
+    which records the image ID block the build used. Least recently used
+    entries are evicted once the cache grows past ``max_bytes`` or
+    ``max_entries``.
+    """
+
+    def __init__(self, directory=BUILD_CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_entry(self, key):
+        try:
+            with open(os.path.join(self._entry_dir(key), ENTRY_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, folder, entry):
+        with open(os.path.join(folder, ENTRY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2, ensure_ascii=False)
+
+    def get(self, key):
+        """Return the entry for ``key`` and mark it as used, or ``None`` on a miss."""
+        entry = self._read_entry(key)
+        if entry is None:
+            return None
+        folder = self._entry_dir(key)
+        if not all(os.path.exists(os.path.join(folder, name)) for name in entry["files"]):
+            logging.warning(f"Build cache entry {key[:12]} is incomplete, dropping it")
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        self._write_entry(folder, entry)
+        return entry
+
+    def restore(self, entry, destination="."):
+        """Copy the cached files into ``destination``; return the path of the main output."""
+        folder = self._entry_dir(entry["key"])
+        for name in entry["files"]:
+            target = os.path.join(destination, name)
+            # Copy next to the target and swap in, as a build does
+            shutil.copyfile(os.path.join(folder, name), target + ".part")
+            os.replace(target + ".part", target)
+        return os.path.join(destination, entry["output"])
+
+    def put(self, key, files, output, image_block):
+        """Store the built ``files``; ``output`` is the one to open, ``image_block`` is ``(first_id, count)``."""
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".entry-", dir=self.directory)
+        try:
+            size = 0
+            for path in files:
+                shutil.copyfile(path, os.path.join(staging, os.path.basename(path)))
+                size += os.path.getsize(path)
+            now = time.time()
+            self._write_entry(staging, {
+                "key": key,
+                "files": [os.path.basename(path) for path in files],
+                "output": os.path.basename(output),
+                "image_block": list(image_block),
+                "size": size,
+                "created": now,
+                "last_used": now,
+                "hits": 0,
+            })
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            os.replace(staging, self._entry_dir(key))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith("."):
+                continue
+            entry = self._read_entry(name)
+            if entry is None:
+                shutil.rmtree(self._entry_dir(name), ignore_errors=True)  # left over from a crash
+                continue
+            entries.append(entry)
+        return entries
+
+    def evict(self):
+        """Drop least recently used entries until the cache is within its limits."""
+        entries = sorted(self.entries(), key=lambda entry: entry["last_used"])
+        total = sum(entry["size"] for entry in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            entry = entries.pop(0)
+            shutil.rmtree(self._entry_dir(entry["key"]), ignore_errors=True)
+            total -= entry["size"]
+            logging.info(f"Evicted build cache entry {entry['key'][:12]} ({entry['size']} bytes)")
@@ -0,0 +1,151 @@
+import heapq
+import math
+import re
+from functools import lru_cache
+
+from palette_index import parse_rgba
+
+# CIE76 ΔE below which two colors are treated as the same paint (~1 just-noticeable difference)
+DUPLICATE_DELTA_E = 2.3
+
+_HEX = re.compile(r'#?([0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})')
+
+# sRGB channel value -> linear light, for all 256 values at once
+_LINEAR = [c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in (v / 255.0 for v in range(256))]
+
+# D65 reference white
+_WHITE = (0.95047, 1.0, 1.08883)
+_EPSILON = 216 / 24389
+_KAPPA = 24389 / 27
+
+
+def _f(t):
+    return t ** (1 / 3) if t > _EPSILON else (_KAPPA * t + 16) / 116
+
+
+def rgb_to_lab(r, g, b):
+    r, g, b = _LINEAR[r], _LINEAR[g], _LINEAR[b]
+    fx = _f((0.4124564 * r + 0.3575761 * g + 0.1804375 * b) / _WHITE[0])
+    fy = _f((0.2126729 * r + 0.7151522 * g + 0.0721750 * b) / _WHITE[1])
+    fz = _f((0.0193339 * r + 0.1191920 * g + 0.9503041 * b) / _WHITE[2])
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+
+def hex_to_rgb(hex_color):
+    match = _HEX.fullmatch((hex_color or "").strip())
+    if not match:
+        raise ValueError(f"Invalid hex color: {hex_color}")
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = ''.join([c * 2 for c in digits])
+    return tuple(bytes.fromhex(digits))
+
+
+def delta_e(lab1, lab2):
+    # CIE76: plain distance in Lab, which is what lets the k-d tree prune
+    return math.dist(lab1, lab2)
+
+
+class ColorIndex:
+    """Nearest-color lookups in CIE Lab over a k-d tree.
+
+    ``names`` and ``rgbs`` are aligned; positions returned by the queries
+    refer to them.
+    """
+
+    def __init__(self, names, rgbs):
+        self.names = tuple(names)
+        self.rgbs = tuple(tuple(rgb) for rgb in rgbs)
+        self.labs = [rgb_to_lab(*rgb) for rgb in self.rgbs]
+        self._tree = self._build(list(range(len(self.labs))), 0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build(self, positions, depth):
+        # Node: (position, axis, left, right)
+        if not positions:
+            return None
+        axis = depth % 3
+        positions.sort(key=lambda position: self.labs[position][axis])
+        mid = len(positions) // 2
+        return (positions[mid], axis,
+                self._build(positions[:mid], depth + 1), self._build(positions[mid + 1:], depth + 1))
+
+    def nearest_lab(self, lab, k=1):
+        """Return up to ``k`` ``(delta_e, position)`` pairs, closest first."""
+        best = []  # max-heap of (-distance, -position); ties go to the earlier palette entry
+        stack = [self._tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            position, axis, left, right = node
+            distance = delta_e(lab, self.labs[position])
+            if len(best) < k:
+                heapq.heappush(best, (-distance, -position))
+            elif (-distance, -position) > best[0]:
+                heapq.heapreplace(best, (-distance, -position))
+
+            offset = lab[axis] - self.labs[position][axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            # The far side can only hold a closer color if the splitting plane is within reach
+            if len(best) < k or abs(offset) <= -best[0][0]:
+                stack.append(far)
+            stack.append(near)
+        return sorted((-distance, -position) for distance, position in best)
+
+    def within_lab(self, lab, radius):
+        """Return the positions of every color within ``radius`` ΔE of ``lab``."""
+        found = []
+        stack = [self._tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            position, axis, left, right = node
+            if delta_e(lab, self.labs[position]) <= radius:
+                found.append(position)
+            offset = lab[axis] - self.labs[position][axis]
+            if offset - radius <= 0:
+                stack.append(left)
+            if offset + radius >= 0:
+                stack.append(right)
+        return sorted(found)
+
+    def nearest(self, rgb, k=1):
+        return self.nearest_lab(rgb_to_lab(*rgb), k)
+
+    def nearest_hex(self, hex_color):
+        """Return ``(name, delta_e)`` of the palette color closest to ``hex_color``."""
+        if not self.names:
+            return None
+        distance, position = self.nearest(hex_to_rgb(hex_color))[0]
+        return self.names[position], distance
+
+    def near_duplicates(self, threshold=DUPLICATE_DELTA_E):
+        """Return ``(i, j, delta_e)`` for every pair ``i < j`` closer than ``threshold``."""
+        pairs = []
+        for i, lab in enumerate(self.labs):
+            for j in self.within_lab(lab, threshold):
+                if j > i:
+                    pairs.append((i, j, delta_e(lab, self.labs[j])))
+        return pairs
+
+
+@lru_cache(maxsize=8)
+def _index(colors):
+    names = []
+    rgbs = []
+    for couleur, rgba in colors:
+        try:
+            rgbs.append(parse_rgba(rgba)[:3])
+        except ValueError:
+            continue
+        names.append(couleur)
+    return ColorIndex(names, rgbs)
+
+
+def color_index_for(couleur_rgba_dict):
+    """Return the shared :class:`ColorIndex` for a ``{couleur: rgba}`` mapping."""
+    return _index(tuple(couleur_rgba_dict.items()))
@@ -2,12 +2,14 @@ import csv
 import sys
 import logging
 import os
+import re
+
+from color_index import ColorIndex, DUPLICATE_DELTA_E
+from palette_index import parse_rgba
+from log_setup import setup_logging
+
+HEX_PATTERN = re.compile(r'#?([0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})')
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
 
 def hex_to_rgba(hex_color, alpha=1.0):
     try:
@@ -31,40 +33,156 @@ def hex_to_rgba(hex_color, alpha=1.0):
         return "rgba(0,0,0,1)"  # Default to black if error
 
 
-def process_csv(input_file, col_hexacolor, delimiter=';'):
+def normalize_hex(hex_color):
+    match = HEX_PATTERN.fullmatch((hex_color or "").strip())
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = ''.join([c * 2 for c in digits])
+    return digits.upper()
+
+
+def hex_column_to_rgba(hex_colors, alpha=1.0):
+    """Convert a whole column of hex codes in one pass.
+
+    Returns ``(rgba_values, invalid)`` where ``rgba_values`` is aligned with the
+    input (``None`` for bad codes) and ``invalid`` lists ``(index, value)`` pairs.
+    """
+    normalized = [normalize_hex(value) for value in hex_colors]
+    invalid = [(idx, value) for idx, (value, digits) in enumerate(zip(hex_colors, normalized)) if digits is None]
+
+    # One fromhex call decodes every valid code at once
+    channels = bytes.fromhex(''.join(digits for digits in normalized if digits is not None))
+
+    rgba_values = []
+    offset = 0
+    for digits in normalized:
+        if digits is None:
+            rgba_values.append(None)
+            continue
+        r, g, b = channels[offset:offset + 3]
+        offset += 3
+        rgba_values.append(f"rgba({r}, {g}, {b}, {alpha})")
+    return rgba_values, invalid
+
+
+def _read_existing_output(output_file, delimiter):
+    if not os.path.exists(output_file):
+        return None, [], "\r\n"
+    with open(output_file, 'r', newline='', encoding='utf-8') as existing:
+        content = existing.read()
+    lineterminator = "\r\n" if "\r\n" in content else "\n"
+    reader = csv.DictReader(content.splitlines(), delimiter=delimiter)
+    return reader.fieldnames, list(reader), lineterminator
+
+
+def find_near_duplicates(rgba_values, threshold=DUPLICATE_DELTA_E):
+    """Return ``(i, j, delta_e)`` for rows whose colors are closer than ``threshold`` (CIE76 ΔE)."""
+    rgbs = [parse_rgba(rgba)[:3] for rgba in rgba_values]
+    return ColorIndex(range(len(rgbs)), rgbs).near_duplicates(threshold)
+
+
+def process_csv(input_file, col_hexacolor, delimiter=';', output_file="../correspondance_rgba.csv", incremental=True,
+                merge_duplicates=False, duplicate_delta_e=DUPLICATE_DELTA_E):
     try:
         if not os.path.exists(input_file):
             logging.error(f"File {input_file} does not exist.")
             return
 
-        output_file = "../correspondance_rgba.csv"
-
-        with open(input_file, 'r', newline='', encoding='utf-8') as infile, \
-                open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-
+        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
             reader = csv.DictReader(infile, delimiter=delimiter)
-            fieldnames = reader.fieldnames + ['RGBA']
-
-            if col_hexacolor not in reader.fieldnames:
+            if not reader.fieldnames or col_hexacolor not in reader.fieldnames:
                 logging.error(f"Column '{col_hexacolor}' not found in CSV headers.")
                 return
-
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter=delimiter)
-            writer.writeheader()
-
-            for row in reader:
-                hex_color = row[col_hexacolor]
-                rgba_value = hex_to_rgba(hex_color)
-                row['RGBA'] = rgba_value
-                writer.writerow(row)
-
-        logging.info(f"Processing complete. Output saved to {output_file}")
+            fieldnames = reader.fieldnames + ['RGBA']
+            rows = list(reader)
+
+        existing_fields, existing_rows, lineterminator = (None, [], "\r\n")
+        if incremental:
+            existing_fields, existing_rows, lineterminator = _read_existing_output(output_file, delimiter)
+            if existing_fields != fieldnames:
+                existing_rows = []
+
+        # Reuse RGBA values of rows whose hex code has not changed
+        known = {}
+        for row in existing_rows:
+            digits = normalize_hex(row.get(col_hexacolor))
+            if digits and row.get('RGBA'):
+                known[digits] = row['RGBA']
+
+        pending = [idx for idx, row in enumerate(rows) if normalize_hex(row[col_hexacolor]) not in known]
+        rgba_values, invalid = hex_column_to_rgba([rows[idx][col_hexacolor] for idx in pending])
+        invalid = [(pending[idx], value) for idx, value in invalid]
+        for idx, rgba in zip(pending, rgba_values):
+            rows[idx]['RGBA'] = rgba
+        for row in rows:
+            if 'RGBA' not in row:
+                row['RGBA'] = known[normalize_hex(row[col_hexacolor])]
+
+        if invalid:
+            # Header is line 1, so data row N is line N + 2
+            details = ", ".join(f"line {idx + 2}: {value!r}" for idx, value in invalid)
+            logging.error(f"{len(invalid)} invalid hex colors skipped in {input_file}: {details}")
+        valid = [(idx, row) for idx, row in enumerate(rows) if row['RGBA'] is not None]
+
+        # Flag colors that are visually the same; with merge_duplicates only the first one is kept
+        near_duplicates = [
+            (valid[i][0] + 2, valid[j][0] + 2, round(distance, 2))
+            for i, j, distance in find_near_duplicates([row['RGBA'] for idx, row in valid], duplicate_delta_e)
+        ]
+        merged = set()
+        if near_duplicates:
+            # The pairs are listed at DEBUG, e.g. CONFIGURATOR_LOG_LEVELS="convert_color=DEBUG"
+            logging.warning(f"{len(near_duplicates)} near-duplicate color pairs (ΔE < {duplicate_delta_e}) in {input_file}")
+            for line_a, line_b, distance in near_duplicates:
+                logging.debug(f"Near-duplicate colors: lines {line_a}/{line_b} ΔE {distance}")
+            if merge_duplicates:
+                for line_a, line_b, distance in near_duplicates:
+                    if line_a not in merged:
+                        merged.add(line_b)
+                logging.info(f"Merged {len(merged)} near-duplicate colors into the first of each group")
+        valid_rows = [row for idx, row in valid if idx + 2 not in merged]
+
+        # Append when the existing output is an unchanged prefix of the new one
+        prefix = len(existing_rows)
+        can_append = 0 < prefix <= len(valid_rows) and all(
+            old == new for old, new in zip(existing_rows, valid_rows[:prefix])
+        )
+
+        if can_append:
+            with open(output_file, 'a', newline='', encoding='utf-8') as outfile:
+                writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter=delimiter, lineterminator=lineterminator)
+                writer.writerows(valid_rows[prefix:])
+            appended = len(valid_rows) - prefix
+        else:
+            with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+                writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter=delimiter, lineterminator=lineterminator)
+                writer.writeheader()
+                writer.writerows(valid_rows)
+            appended = None
+
+        summary = {
+            "rows": len(valid_rows),
+            "converted": len(pending) - len(invalid),
+            "reused": len(rows) - len(pending),
+            "appended": appended,
+            "invalid": invalid,
+            "near_duplicates": near_duplicates,
+            "merged": len(merged),
+        }
+        if appended is None:
+            logging.info(f"Processing complete. Output saved to {output_file} ({summary['converted']} converted, {summary['reused']} reused)")
+        else:
+            logging.info(f"Processing complete. Appended {appended} new colors to {output_file}")
+        return summary
 
     except Exception as e:
         logging.error(f"Error processing CSV: {e}")
 
 
 if __name__ == "__main__":
+    setup_logging(log_file=None, console=True)
     input_csv = "../correspondance.csv"
     col_hexacolor = "Code"
     delimiter = ";"
@@ -0,0 +1,188 @@
+import json
+import logging
+
+# Settings that are compared as a whole; components and editor images are diffed per entry
+_COLLECTION_KEYS = ("_wpc_components", "_wpc_editor_images")
+
+
+def load_configurator(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _child_key(child, seen):
+    # Children are matched by color; a repeated color gets an occurrence number
+    color = child.get("settings", {}).get("color") or child.get("name")
+    occurrence = seen.get(color, 0)
+    seen[color] = occurrence + 1
+    return (color, occurrence)
+
+
+def _child_image_id(child):
+    return str(child["settings"]["views"]["front"]["image"])
+
+
+def _without_uid(entry):
+    return {key: value for key, value in entry.items() if key != "uid"}
+
+
+def _child_signature(child, image):
+    return (_without_uid(child), _without_uid(image) if image else None)
+
+
+def index_configurator(doc):
+    """Map section name -> (component, {(color, n): (child, image_id, editor_image)})."""
+    settings = doc.get("settings", {})
+    images = settings.get("_wpc_editor_images", {})
+    sections = {}
+    for component in settings.get("_wpc_components", []):
+        children = {}
+        seen = {}
+        for child in component.get("children", []):
+            image_id = _child_image_id(child)
+            children[_child_key(child, seen)] = (child, image_id, images.get(image_id))
+        sections[component["name"]] = (component, children)
+    return sections
+
+
+def adopt_previous_ids(previous, group_layer_image, sections_data):
+    """Reuse image IDs and UIDs from a previous build for images whose source did not change.
+
+    ``group_layer_image`` and the section children are updated in place.
+    Returns the dicts that still need a fresh ``image_id``.
+    """
+    previous_sections = index_configurator(previous)
+    needs_id = []
+
+    group = previous_sections.get("Group Layer 1")
+    group_image = next(iter(group[1].values()), None) if group else None
+    if group_image and group_image[2] and group_image[2].get("src") == group_layer_image["src"]:
+        group_layer_image["image_id"] = int(group_image[1])
+        group_layer_image["uid"] = group_image[0]["uid"]
+        group_layer_image["group_uid"] = group[0]["uid"]
+    else:
+        needs_id.append(group_layer_image)
+
+    for section in sections_data:
+        previous_section = previous_sections.get(section["name"])
+        if previous_section:
+            section["uid"] = previous_section[0]["uid"]
+        previous_children = previous_section[1] if previous_section else {}
+
+        seen = {}
+        for img in section["children"]:
+            key = _child_key({"settings": {"color": img["color"]}}, seen)
+            match = previous_children.get(key)
+            if match and match[2] and match[2].get("src") == img["src"]:
+                img["image_id"] = int(match[1])
+                img["uid"] = match[0]["uid"]
+            else:
+                needs_id.append(img)
+
+    return needs_id
+
+
+def assign_ids(entries, start):
+    for offset, entry in enumerate(entries):
+        entry["image_id"] = start + offset
+    return start + len(entries)
+
+
+def diff_configurators(previous, current):
+    """Build a patch holding only what changed between two configurator documents.
+
+    Components are matched by section name and children by color; UIDs are
+    ignored when comparing. Added and changed sections are emitted whole,
+    editor images only when they are new or different.
+    """
+    previous_settings = previous.get("settings", {})
+    current_settings = current.get("settings", {})
+    previous_sections = index_configurator(previous)
+    current_sections = index_configurator(current)
+    previous_images = previous_settings.get("_wpc_editor_images", {})
+    current_images = current_settings.get("_wpc_editor_images", {})
+
+    summary = {
+        "sections_added": 0, "sections_removed": 0, "sections_changed": 0, "sections_unchanged": 0,
+        "children_added": 0, "children_removed": 0, "children_changed": 0,
+        "editor_images_added": 0, "editor_images_removed": 0, "editor_images_changed": 0,
+    }
+
+    changed_components = []
+    for name, (component, children) in current_sections.items():
+        if name not in previous_sections:
+            summary["sections_added"] += 1
+            summary["children_added"] += len(children)
+            changed_components.append(component)
+            continue
+
+        previous_component, previous_children = previous_sections[name]
+        added = [key for key in children if key not in previous_children]
+        removed = [key for key in previous_children if key not in children]
+        changed = [
+            key for key in children
+            if key in previous_children
+            and _child_signature(children[key][0], children[key][2])
+            != _child_signature(previous_children[key][0], previous_children[key][2])
+        ]
+        shell_changed = (
+            {k: v for k, v in _without_uid(component).items() if k != "children"}
+            != {k: v for k, v in _without_uid(previous_component).items() if k != "children"}
+            or list(children) != list(previous_children)
+        )
+
+        summary["children_added"] += len(added)
+        summary["children_removed"] += len(removed)
+        summary["children_changed"] += len(changed)
+        if added or removed or changed or shell_changed:
+            summary["sections_changed"] += 1
+            changed_components.append(component)
+        else:
+            summary["sections_unchanged"] += 1
+
+    removed_components = [name for name in previous_sections if name not in current_sections]
+    summary["sections_removed"] = len(removed_components)
+    for name in removed_components:
+        summary["children_removed"] += len(previous_sections[name][1])
+
+    changed_images = {}
+    for image_id, image in current_images.items():
+        if image_id not in previous_images:
+            summary["editor_images_added"] += 1
+            changed_images[image_id] = image
+        elif _without_uid(image) != _without_uid(previous_images[image_id]):
+            summary["editor_images_changed"] += 1
+            changed_images[image_id] = image
+    removed_images = [image_id for image_id in previous_images if image_id not in current_images]
+    summary["editor_images_removed"] = len(removed_images)
+
+    settings = {
+        key: value for key, value in current_settings.items()
+        if key not in _COLLECTION_KEYS and previous_settings.get(key) != value
+    }
+    settings["_wpc_components"] = changed_components
+    settings["_wpc_editor_images"] = changed_images
+    settings["_wpc_component_order"] = list(current_sections)
+
+    return {
+        "title": current.get("title"),
+        "type": "amz_configurator_patch",
+        "base_title": previous.get("title"),
+        "settings": settings,
+        "removed": {
+            "_wpc_components": removed_components,
+            "_wpc_editor_images": removed_images,
+        },
+        "summary": summary,
+    }
+
+
+def write_patch(patch, filename, indent=2):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(patch, f, indent=indent, ensure_ascii=False)
+    summary = patch["summary"]
+    logging.info(
+        f"Delta written to {filename}: "
+        + ", ".join(f"{key}={value}" for key, value in summary.items() if value)
+    )
+    return summary
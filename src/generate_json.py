@@ -1,8 +1,69 @@
 import json
-import uuid
+import logging
+import os
+import shutil
+import tempfile
+
+from assemble import ChildImage
+from metrics import span_for
+from uids import RandomUidProvider
+from delta import load_configurator, diff_configurators, write_patch
+from shards import (SHARD_TYPE, SHARD_KEY, SHARD_INDEX_TYPE, shard_path, index_path,
+                    remove_stale_shards)
+
+_IMAGE_NAMES = []
+
+
+def _image_names(count):
+    # "Image 1" .. "Image <count>", formatted once per process
+    for idx in range(len(_IMAGE_NAMES) + 1, count + 1):
+        _IMAGE_NAMES.append(f"Image {idx}")
+    return _IMAGE_NAMES[:count]
+
+
+class _Encoder:
+    """JSON fragments laid out exactly as ``json.dump`` with the same indent would write them."""
+
+    def __init__(self, indent):
+        self.indent = indent
+        self.item_sep, self.key_sep = (",", ": ") if indent is not None else (",", ":")
+
+    def nl(self, level):
+        return "\n" + " " * (self.indent * level) if self.indent is not None else ""
+
+    def dump(self, value, level=0):
+        text = json.dumps(value, indent=self.indent, ensure_ascii=False, separators=(self.item_sep, self.key_sep))
+        return text.replace("\n", self.nl(level)) if self.indent is not None else text
+
+    def member(self, key, value, level):
+        return self.dump(key) + self.key_sep + self.dump(value, level)
+
+    def component(self, component, editor_images, component_count, image_count):
+        # One entry of _wpc_components and its _wpc_editor_images members, at settings depth
+        component_text = (self.item_sep if component_count else "") + self.nl(3) + self.dump(component, 3)
+        images_text = "".join(
+            (self.item_sep if image_count or idx else "") + self.nl(3) + self.member(image_id, image, 3)
+            for idx, (image_id, image) in enumerate(editor_images.items())
+        )
+        return component_text, images_text
+
+    def close_components(self, count):
+        return (self.nl(2) if count else "") + "]" + self.item_sep + self.nl(2)
+
+    def close_images(self, count):
+        return (self.nl(2) if count else "") + "}"
+
 
 class ConfiguratorJSONGenerator:
-    def __init__(self, title, base_price, config_style, custom_js, custom_css, form, group_layer_image, sections_data):
+    # Inputs that only affect the document envelope, not the components
+    _ENVELOPE_FIELDS = ("title", "base_price", "config_style", "custom_js", "custom_css", "form")
+
+    def __init__(self, title, base_price, config_style, custom_js, custom_css, form, group_layer_image, sections_data,
+                 metrics=None, uid_provider=None):
+        self._result = None
+        self._group_part = None
+        self._section_parts = []
+        self.uid_provider = uid_provider or RandomUidProvider()
         self.title = title
         self.base_price = base_price
         self.config_style = config_style
@@ -10,26 +71,99 @@ class ConfiguratorJSONGenerator:
         self.custom_css = custom_css
         self.form = form
         self.group_layer_image = group_layer_image  # dict: image_id, src, width, height
-        self.sections_data = sections_data  # list of sections
+        self.sections_data = sections_data  # list of sections (any iterable when streaming)
         self.editor_images = {}
+        self.metrics = metrics  # optional metrics.RunMetrics
+
+    def __setattr__(self, name, value):
+        # Assigning an input drops only the cached parts that depend on it
+        if name == "uid_provider" or (name == "title" and getattr(self, "uid_provider", None)
+                                      and self.uid_provider.depends_on_title):
+            object.__setattr__(self, "_group_part", None)
+            object.__setattr__(self, "_section_parts", [])
+            object.__setattr__(self, "_result", None)
+        elif name in self._ENVELOPE_FIELDS:
+            object.__setattr__(self, "_result", None)
+        elif name == "group_layer_image":
+            object.__setattr__(self, "_group_part", None)
+            object.__setattr__(self, "_result", None)
+        elif name == "sections_data":
+            object.__setattr__(self, "_section_parts", [])
+            object.__setattr__(self, "_result", None)
+        object.__setattr__(self, name, value)
+
+    def invalidate(self, section_index=None):
+        """Forget cached output after inputs were mutated in place.
+
+        With ``section_index`` only that section is rebuilt on the next
+        :meth:`generate`; otherwise every component is.
+        """
+        self._result = None
+        if section_index is None:
+            self._group_part = None
+            self._section_parts = []
+        elif section_index < len(self._section_parts):
+            self._section_parts[section_index] = None
 
-    def _generate_uid(self):
-        return uuid.uuid4().hex[:4] + "-" + uuid.uuid4().hex[:4]
+    def update_section(self, index, section):
+        self.sections_data[index] = section
+        self.invalidate(index)
+
+    def add_section(self, section):
+        self.sections_data.append(section)
+        self._result = None
+
+    def remove_section(self, index):
+        del self.sections_data[index]
+        if index < len(self._section_parts):
+            del self._section_parts[index]
+        self._result = None
+
+    def seed_section(self, index, part):
+        """Reuse an already-built ``(component, editor_images)`` for section ``index``.
+
+        Used for sections loaded from a published file (see loader). Their
+        UIDs are claimed so newly generated ones cannot collide with them.
+        """
+        section = self.sections_data[index]
+        self._uid_for(section.get("uid"), section["name"])
+        for idx, img in enumerate(section["children"], start=1):
+            self._uid_for(img.get("uid"), section["name"], img.get("couleur") or f"Image {idx}")
+        parts = self._section_parts
+        if len(parts) <= index:
+            parts.extend([None] * (index + 1 - len(parts)))
+        parts[index] = part
+        self._result = None
+
+    def _generate_uid(self, *key):
+        # key identifies the component inside the configurator (section name, color)
+        return self.uid_provider.uid(self.title, *key)
+
+    def _uid_for(self, existing, *key):
+        # Previously published UIDs (see delta.adopt_previous_ids) are kept as is
+        if existing:
+            return self.uid_provider.claim(existing, self.title, *key)
+        return self._generate_uid(*key)
 
     def _build_group_layer(self):
-        group_layer_uid = self._generate_uid()
-        child_uid = self._generate_uid()
-
-        # Add to editor images
-        self.editor_images[str(self.group_layer_image["image_id"])] = {
-            "uid": child_uid,
-            "key": "image",
-            "src": self.group_layer_image["src"],
-            "width": self.group_layer_image["width"],
-            "height": self.group_layer_image["height"]
+        span = span_for(self.metrics)
+        with span("uid generation"):
+            group_layer_uid = self._uid_for(self.group_layer_image.get("group_uid"), "Group Layer 1")
+            child_uid = self._uid_for(self.group_layer_image.get("uid"), "Group Layer 1", "Image 1")
+        if self.metrics:
+            self.metrics.count("editor_images")
+
+        editor_images = {
+            str(self.group_layer_image["image_id"]): {
+                "uid": child_uid,
+                "key": "image",
+                "src": self.group_layer_image["src"],
+                "width": self.group_layer_image["width"],
+                "height": self.group_layer_image["height"]
+            }
         }
 
-        return {
+        component = {
             "name": "Group Layer 1",
             "uid": group_layer_uid,
             "type": "group",
@@ -53,73 +187,303 @@ class ConfiguratorJSONGenerator:
                 "hide_control": True
             }
         }
+        return component, editor_images
 
-    def _build_sections(self):
-        sections = []
-        for section in self.sections_data:
-            section_uid = self._generate_uid()
-            children_list = []
+    def _build_section(self, section):
+        span = span_for(self.metrics)
+        with span("component build"):
+            children = [img if type(img) is ChildImage else ChildImage.from_dict(img) for img in section["children"]]
+            with span("uid generation"):
+                section_uid = self._uid_for(section.get("uid"), section["name"])
+                child_uids = [self._uid_for(img.uid, section["name"], img.couleur or f"Image {idx}")
+                              for idx, img in enumerate(children, start=1)]
 
-            for idx, img in enumerate(section["children"], start=1):
-                child_uid = self._generate_uid()
-                children_list.append({
-                    "name": f"Image {idx}",
-                    "uid": child_uid,
-                    "type": "image",
-                    "actions": {"open": False, "show": False},
-                    "settings": {
-                        "control_type": "color",
-                        "views": {"front": {"image": img["image_id"]}},
-                        "color": img["color"]
-                    }
-                })
+            component, editor_images = self._assemble_section(section, section_uid, children, child_uids)
 
-                # Add to editor images
-                self.editor_images[str(img["image_id"])] = {
-                    "uid": child_uid,
-                    "key": "image",
-                    "src": img["src"],
-                    "width": img["width"],
-                    "height": img["height"]
-                }
+        if self.metrics:
+            self.metrics.count("sections")
+            self.metrics.count("children", len(children))
+            self.metrics.count("editor_images", len(editor_images))
+        return component, editor_images
+
+    def _assemble_section(self, section, section_uid, children, child_uids):
+        children_list = []
+        editor_images = {}
+        names = _image_names(len(children))
 
-            sections.append({
-                "name": section["name"],
-                "uid": section_uid,
-                "type": "group",
-                "actions": {"open": True, "show": True},
-                "children": children_list,
+        for name, img, child_uid in zip(names, children, child_uids):
+            image_id = img.image_id
+            children_list.append({
+                "name": name,
+                "uid": child_uid,
+                "type": "image",
+                "actions": {"open": False, "show": False},
                 "settings": {
-                    "custom_class": section["custom_class"],
-                    "control_type": "icon"
+                    "control_type": "color",
+                    "views": {"front": {"image": image_id}},
+                    "color": img.color
                 }
             })
-        return sections
+
+            editor_images[str(image_id)] = {
+                "uid": child_uid,
+                "key": "image",
+                "src": img.src,
+                "width": img.width,
+                "height": img.height
+            }
+
+        component = {
+            "name": section["name"],
+            "uid": section_uid,
+            "type": "group",
+            "actions": {"open": True, "show": True},
+            "children": children_list,
+            "settings": {
+                "custom_class": section["custom_class"],
+                "control_type": "icon"
+            }
+        }
+        return component, editor_images
+
+    def _iter_components(self, keep_parts=True):
+        # Yields (component, editor_images) one at a time, group layer first.
+        # Parts are cached as they are built, so a later generate() or
+        # save_delta() reuses them (and their UIDs). keep_parts=False drops
+        # them instead, for one-shot writes that must stay flat in memory.
+        group_part = self._group_part or self._build_group_layer()
+        if keep_parts:
+            self._group_part = group_part
+        yield group_part
+        parts = self._section_parts
+        for idx, section in enumerate(self.sections_data):
+            part = parts[idx] if idx < len(parts) else None
+            if part is None:
+                part = self._build_section(section)
+                if keep_parts:
+                    if len(parts) <= idx:
+                        parts.extend([None] * (idx + 1 - len(parts)))
+                    parts[idx] = part
+            yield part
+
+    def _build_parts(self):
+        if self._group_part is None:
+            self._group_part = self._build_group_layer()
+        parts = self._section_parts
+        if len(parts) < len(self.sections_data):
+            parts.extend([None] * (len(self.sections_data) - len(parts)))
+        del parts[len(self.sections_data):]
+        for idx, section in enumerate(self.sections_data):
+            if parts[idx] is None:
+                parts[idx] = self._build_section(section)
+        return [self._group_part] + parts
+
+    def _settings_head(self):
+        return {
+            "_wpc_data_version": "3.4",
+            "_wpc_config_style": self.config_style,
+            "_wpc_views": {
+                "front": "Front"
+                },
+            "_wpc_form": self.form,
+            "_wpc_base_price": self.base_price,
+        }
+
+    def _settings_tail(self):
+        return {
+            "_wpc_custom_js": self.custom_js,
+            "_wpc_custom_css": self.custom_css
+        }
 
     def generate(self):
-        components = [self._build_group_layer()] + self._build_sections()
+        if self._result is not None:
+            return self._result
+
+        components = []
+        self.editor_images = {}
+        for component, editor_images in self._build_parts():
+            components.append(component)
+            self.editor_images.update(editor_images)
+
+        settings = self._settings_head()
+        settings["_wpc_components"] = components
+        settings["_wpc_editor_images"] = self.editor_images
+        settings.update(self._settings_tail())
 
         config_data = {
             "title": self.title,
             "type": "amz_configurator",
-            "settings": {   
-                "_wpc_data_version": "3.4",
-                "_wpc_config_style": self.config_style,
-                "_wpc_views": {
-                    "front": "Front"
-                    },
-                "_wpc_form": self.form,
-                "_wpc_base_price": self.base_price,
-                "_wpc_components": components,
-                "_wpc_editor_images": self.editor_images,
-                "_wpc_custom_js": self.custom_js,
-                "_wpc_custom_css": self.custom_css
-            }
+            "settings": settings
         }
+        self._result = config_data
         return config_data
 
-    def save_to_file(self, filename):
-        data = self.generate()
+    def write_stream(self, f, indent=2, progress=None, keep_parts=True):
+        """Write the configurator to ``f`` one component at a time.
+
+        Output matches ``json.dump`` of :meth:`generate` for the same indent;
+        ``indent=None`` writes compact JSON. Editor images are spooled to a
+        temporary file because they follow the components in the document.
+        ``progress(done, total)`` is called after each component and may raise
+        to abort the write. With ``keep_parts=False`` built components are
+        not cached, so only one is held at a time; a later :meth:`generate`
+        then builds them again with new UIDs.
+        """
+        total = len(self.sections_data) + 1 if hasattr(self.sections_data, "__len__") else None
+        enc = _Encoder(indent)
+        span = span_for(self.metrics)
+
+        f.write(self._envelope_head(enc, "amz_configurator"))
+        for key, value in self._settings_head().items():
+            f.write(enc.member(key, value, 2) + enc.item_sep + enc.nl(2))
+
+        component_count = 0
+        image_count = 0
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+            f.write(enc.dump("_wpc_components") + enc.key_sep + "[")
+            for component, editor_images in self._iter_components(keep_parts):
+                with span("serialization"):
+                    component_text, images_text = enc.component(component, editor_images, component_count,
+                                                                image_count)
+                with span("file write"):
+                    f.write(component_text)
+                    spool.write(images_text)
+                component_count += 1
+                image_count += len(editor_images)
+                if progress:
+                    progress(component_count, total)
+            f.write(enc.close_components(component_count))
+
+            f.write(enc.dump("_wpc_editor_images") + enc.key_sep + "{")
+            with span("file write"):
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+            f.write(enc.close_images(image_count))
+
+        for key, value in self._settings_tail().items():
+            f.write(enc.item_sep + enc.nl(2) + enc.member(key, value, 2))
+        f.write(enc.nl(1) + "}" + enc.nl(0) + "}")
+
+    def _envelope_head(self, enc, doc_type, extra=()):
+        # '{ "title": ..., "type": ..., [extra members,] "settings": {' up to the first setting
+        text = "{" + enc.nl(1)
+        text += enc.member("title", self.title, 1) + enc.item_sep + enc.nl(1)
+        text += enc.member("type", doc_type, 1) + enc.item_sep + enc.nl(1)
+        for key, value in extra:
+            text += enc.member(key, value, 1) + enc.item_sep + enc.nl(1)
+        return text + enc.dump("settings") + enc.key_sep + "{" + enc.nl(2)
+
+    def save_sharded(self, filename, max_bytes, indent=2, progress=None, keep_parts=True):
+        """Split the configurator over several files of at most ``max_bytes`` each.
+
+        Components are never split: each shard holds whole sections and the
+        editor images they reference, and is written as soon as it is full.
+        ``<name>.index.json`` lists the shards and holds the remaining
+        settings; :func:`shards.load_sharded` reassembles the document.
+        A single section larger than ``max_bytes`` gets a shard of its own.
+        ``keep_parts`` is as for :meth:`write_stream`. Returns the index.
+        """
+        total = len(self.sections_data) + 1 if hasattr(self.sections_data, "__len__") else None
+        enc = _Encoder(indent)
+        span = span_for(self.metrics)
+        shard_list = []
+        pending = []  # (component_name, component_text, images_text, image_count) of the open shard
+        pending_bytes = 0
+
+        def shard_overhead(number):
+            head = self._envelope_head(enc, SHARD_TYPE, [(SHARD_KEY, number)])
+            head += enc.dump("_wpc_components") + enc.key_sep + "[" + enc.close_components(1)
+            head += enc.dump("_wpc_editor_images") + enc.key_sep + "{" + enc.close_images(1)
+            return len((head + enc.nl(1) + "}" + enc.nl(0) + "}").encode("utf-8"))
+
+        def flush():
+            number = len(shard_list) + 1
+            path = shard_path(filename, number)
+            with span("file write"), open(path, "w", encoding="utf-8") as f:
+                f.write(self._envelope_head(enc, SHARD_TYPE, [(SHARD_KEY, number)]))
+                f.write(enc.dump("_wpc_components") + enc.key_sep + "[")
+                f.write("".join(text for name, text, images, count in pending))
+                f.write(enc.close_components(len(pending)))
+                f.write(enc.dump("_wpc_editor_images") + enc.key_sep + "{")
+                f.write("".join(images for name, text, images, count in pending))
+                image_count = sum(count for name, text, images, count in pending)
+                f.write(enc.close_images(image_count))
+                f.write(enc.nl(1) + "}" + enc.nl(0) + "}")
+            shard_list.append({
+                "file": os.path.basename(path),
+                "bytes": os.path.getsize(path),
+                "components": [name for name, text, images, count in pending],
+                "editor_images": image_count,
+            })
+            pending.clear()
+
+        component_count = 0
+        for component, editor_images in self._iter_components(keep_parts):
+            with span("serialization"):
+                # Text is rendered as if it started its shard; a leading separator is added when it does not
+                first_text, first_images = enc.component(component, editor_images, 0, 0)
+                size = len(first_text.encode("utf-8")) + len(first_images.encode("utf-8"))
+            budget = max_bytes - shard_overhead(len(shard_list) + 1)
+            if pending and pending_bytes + size + 2 * len(enc.item_sep) > budget:
+                flush()
+                pending_bytes = 0
+            if pending:
+                with span("serialization"):
+                    text, images = enc.component(component, editor_images, len(pending),
+                                                 sum(count for name, t, i, count in pending))
+                size = len(text.encode("utf-8")) + len(images.encode("utf-8"))
+            else:
+                text, images = first_text, first_images
+                if size > budget:
+                    logging.warning(f"{component['name']} alone is {size} bytes, over the {max_bytes} byte shard limit")
+            pending.append((component["name"], text, images, len(editor_images)))
+            pending_bytes += size
+            component_count += 1
+            if progress:
+                progress(component_count, total)
+        if pending or not shard_list:
+            flush()
+
+        settings = self._settings_head()
+        settings.update(self._settings_tail())
+        index = {
+            "title": self.title,
+            "type": SHARD_INDEX_TYPE,
+            "settings": settings,
+            "shards": shard_list,
+        }
+        with span("file write"):
+            remove_stale_shards(filename, len(shard_list))
+            with open(index_path(filename), "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=indent, ensure_ascii=False)
+        if self.metrics:
+            self.metrics.count("bytes_written", sum(shard["bytes"] for shard in shard_list))
+            self.metrics.count("shards", len(shard_list))
+        print(f"✅ JSON saved to {len(shard_list)} shard(s), index {index_path(filename)}")
+        return index
+
+    def save_delta(self, previous, filename, indent=2):
+        """Write only what changed against ``previous`` (a configurator dict or file path).
+
+        After a streamed write this diffs the parts that write kept, so the
+        patch matches the written document. Returns the patch summary.
+        """
+        if isinstance(previous, str):
+            previous = load_configurator(previous)
+        patch = diff_configurators(previous, self.generate())
+        return write_patch(patch, filename, indent=indent)
+
+    def save_to_file(self, filename, stream=False, indent=2, progress=None, keep_parts=True):
+        span = span_for(self.metrics)
         with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+            if stream:
+                self.write_stream(f, indent=indent, progress=progress, keep_parts=keep_parts)
+            else:
+                data = self.generate()
+                separators = None if indent is not None else (",", ":")
+                # json.dump writes while it serializes, so this span covers both
+                with span("serialization"):
+                    json.dump(data, f, indent=indent, ensure_ascii=False, separators=separators)
+        if self.metrics:
+            self.metrics.count("bytes_written", os.path.getsize(filename))
         print(f"✅ JSON saved to {filename}")
@@ -0,0 +1,94 @@
+import http.client
+import ssl
+import threading
+from urllib.parse import urlsplit
+
+
+class KeepAlivePool:
+    """Keep-alive HTTP connections, pooled per origin and shared between threads.
+
+    Used by the asset verifier and the publisher. :meth:`request` sends on an
+    idle connection when there is one, and on a fresh connection otherwise.
+    """
+
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self._idle = {}  # (scheme, host, port) -> [connection]
+        self._lock = threading.Lock()
+        self._ssl_context = None
+
+    @staticmethod
+    def split(url):
+        """Return ``((scheme, host, port), path)`` for an http(s) URL."""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        return (scheme, parts.hostname, port), path
+
+    def _open(self, origin):
+        scheme, host, port = origin
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _take_idle(self, origin):
+        with self._lock:
+            pool = self._idle.get(origin)
+            return pool.pop() if pool else None
+
+    def _release(self, origin, connection):
+        with self._lock:
+            self._idle.setdefault(origin, []).append(connection)
+
+    def close_all(self):
+        with self._lock:
+            for pool in self._idle.values():
+                for connection in pool:
+                    connection.close()
+            self._idle.clear()
+
+    def request(self, method, url, body=None, headers=None):
+        """Send one request; return ``(status, headers, payload)`` with lower-cased header names.
+
+        Raises ``ConnectionError`` (or another ``OSError``, e.g. a timeout)
+        when the server cannot be reached.
+        """
+        origin, path = self.split(url)
+        reused = self._take_idle(origin)
+        connection = reused or self._open(origin)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            payload = response.read()
+        except (ConnectionError, http.client.HTTPException) as e:
+            connection.close()
+            if reused:
+                # The server dropped an idle keep-alive connection; retry on a fresh one
+                return self.request(method, url, body, headers)
+            if isinstance(e, ConnectionError):
+                raise
+            raise ConnectionError(f"Connection closed during {method} {url}") from e
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(origin, connection)
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, payload
+
+
+def describe_statuses(statuses, what, limit=10):
+    """Report ``{item: status}`` as one line per item; ``None`` means the server could not be reached."""
+    lines = [f"{len(statuses)} {what}:"]
+    for item, status in list(statuses.items())[:limit]:
+        lines.append(f"  {status if status is not None else 'unreachable'}  {item}")
+    if len(statuses) > limit:
+        lines.append(f"  ... and {len(statuses) - limit} more")
+    return "\n".join(lines)
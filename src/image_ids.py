@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+IMAGE_ID_RECORD = "../image_id_last_record.json"
+
+
+class AllocatorLockTimeout(Exception):
+    pass
+
+
+class ImageIdAllocator:
+    """Hands out WordPress image IDs from ``image_id_last_record.json``.
+
+    Every reservation takes an exclusive lock on ``<record>.lock``, reads the
+    counter, and persists the new value with an atomic rename, so several
+    windows or processes never receive overlapping IDs.
+    """
+
+    def __init__(self, record_path=IMAGE_ID_RECORD, timeout=10.0):
+        self.record_path = record_path
+        self.lock_path = record_path + ".lock"
+        self.timeout = timeout
+
+    def _acquire(self, handle):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise AllocatorLockTimeout(f"Could not lock {self.lock_path} within {self.timeout}s")
+                time.sleep(0.05)
+
+    def _release(self, handle):
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read(self):
+        try:
+            with open(self.record_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = {}
+        return int(data.get("last_record", 0))
+
+    def _write(self, last_record):
+        directory = os.path.dirname(os.path.abspath(self.record_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".image_id_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({"last_record": last_record}, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.record_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def peek(self):
+        return self._read()
+
+    def reserve(self, count):
+        """Reserve ``count`` consecutive IDs and return the first one."""
+        return self.reserve_blocks([count])[0]
+
+    def reserve_blocks(self, counts):
+        """Reserve one contiguous block per entry of ``counts`` in a single locked write.
+
+        Returns the start of each block, in order.
+        """
+        if any(count < 0 for count in counts):
+            raise ValueError("Block sizes must not be negative")
+
+        with open(self.lock_path, 'a+') as handle:
+            self._acquire(handle)
+            try:
+                start = self._read()
+                starts = []
+                for count in counts:
+                    starts.append(start)
+                    start += count
+                self._write(start)
+            finally:
+                self._release(handle)
+
+        logging.info(f"Reserved {len(starts)} image ID blocks, last_record is now {start}")
+        return starts
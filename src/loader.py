@@ -0,0 +1,431 @@
+import json
+import logging
+import mmap
+import re
+import tempfile
+from functools import lru_cache
+
+from assemble import BASE_URL, STYLE_MAP, ChildImage, build_sections_data
+from delta import adopt_previous_ids
+from palette_index import index_for, parse_color_name
+from shards import load_sharded
+from slug import color_suffix, make_valid_url
+
+# Text is decoded a window at a time; a value larger than the window grows it
+SCAN_WINDOW = 1 << 20
+_WS = re.compile(r'[ \t\n\r]*')
+_scan_once = json.JSONDecoder().scan_once
+
+
+class _Reader:
+    """Walks a UTF-8 JSON buffer with the C scanner, tracking byte offsets.
+
+    Only one window of decoded text and one parsed value are alive at a time.
+    """
+
+    def __init__(self, buffer, window=None):
+        self.buffer = buffer
+        self.window = window or SCAN_WINDOW
+        self._load(0)
+
+    def _load(self, byte_pos):
+        raw = self.buffer[byte_pos:byte_pos + self.window]
+        self.at_eof = byte_pos + len(raw) >= len(self.buffer)
+        if not self.at_eof:
+            # Cut before a partial multi-byte character
+            cut = len(raw)
+            while cut > 0 and (raw[cut - 1] & 0xC0) == 0x80:
+                cut -= 1
+            if cut and raw[cut - 1] >= 0xC0:
+                cut -= 1
+            raw = raw[:cut]
+        self.text = raw.decode("utf-8")
+        self.pos = 0
+        self._char = 0  # byte_at() advances from here
+        self._byte = byte_pos
+
+    def byte_at(self, pos):
+        if pos < self._char:
+            self._char, self._byte = 0, self._byte - len(self.text[:self._char].encode("utf-8"))
+        self._byte += len(self.text[self._char:pos].encode("utf-8"))
+        self._char = pos
+        return self._byte
+
+    def peek(self):
+        self.pos = _WS.match(self.text, self.pos).end()
+        if self.pos >= len(self.text):
+            if self.at_eof:
+                raise ValueError("Truncated configurator file")
+            self._load(self.byte_at(self.pos))
+            return self.peek()
+        return self.text[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at byte {self.byte_at(self.pos)}")
+        self.pos += 1
+
+    def value(self):
+        """Parse the next value; returns ``(value, start_byte, end_byte)``."""
+        self.peek()
+        start = self.byte_at(self.pos)
+        while True:
+            try:
+                value, end = _scan_once(self.text, self.pos)
+                # A number may run on past the window; anything else is complete
+                if end < len(self.text) or self.at_eof:
+                    break
+            except (StopIteration, json.JSONDecodeError):
+                if self.at_eof:
+                    raise ValueError(f"Invalid JSON value at byte {start}")
+            if self.pos == 0:
+                self.window *= 2
+            self._load(start)
+        self.pos = end
+        return value, start, self.byte_at(end)
+
+    def members(self):
+        """Yield each key of the object at the cursor; the caller reads the value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()[0]
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or '}}' at byte {self.byte_at(self.pos - 1)}")
+
+    def items(self):
+        """Yield once per element of the array at the cursor; the caller reads the element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at byte {self.byte_at(self.pos - 1)}")
+
+
+def scan_configurator(buffer):
+    """Index a configurator document by byte spans, one value in memory at a time.
+
+    Returns ``(members, components, names, images)``: top-level and settings
+    members as ``{path: (start, end)}``, the span of each ``_wpc_components``
+    entry, the ``name`` of each component, and ``{image_id: (start, end)}``
+    for ``_wpc_editor_images``.
+    """
+    members = {}
+    components = []
+    names = []
+    images = {}
+
+    reader = _Reader(buffer)
+    for key in reader.members():
+        if key != "settings":
+            members[(key,)] = reader.value()[1:]
+            continue
+        for setting in reader.members():
+            if setting == "_wpc_components":
+                for _ in reader.items():
+                    component, start, end = reader.value()
+                    components.append((start, end))
+                    names.append(component.get("name"))
+            elif setting == "_wpc_editor_images":
+                for image_id in reader.members():
+                    images[image_id] = reader.value()[1:]
+            else:
+                members[("settings", setting)] = reader.value()[1:]
+    return members, components, names, images
+
+
+class ConfiguratorFile:
+    """Read-only, lazily parsed view of a ``configurator.json``.
+
+    One pass over the memory-mapped file indexes components by section name
+    and editor images by image ID; entries are only parsed when asked for.
+    """
+
+    def __init__(self, path, file=None):
+        self.path = path
+        self._file = file or open(path, 'rb')
+        try:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        self._members, self._component_spans, self.section_names, self._image_spans = scan_configurator(self._buffer)
+        if None in self.section_names:
+            raise ValueError(f"{path}: every component needs a name")
+        if self.doc_type != "amz_configurator":
+            raise ValueError(f"{path} is not a configurator (type {self.doc_type!r})")
+        self._by_name = {name: idx for idx, name in enumerate(self.section_names)}
+        self.component = lru_cache(maxsize=None)(self._component)
+
+    def close(self):
+        self._buffer.close()
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._buffer.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _parse(self, span):
+        return json.loads(self._buffer[span[0]:span[1]])
+
+    def _member(self, *path, default=None):
+        span = self._members.get(path)
+        return self._parse(span) if span else default
+
+    @property
+    def title(self):
+        return self._member("title")
+
+    @property
+    def doc_type(self):
+        return self._member("type")
+
+    def settings(self):
+        """Every setting except the component and editor image collections."""
+        return {path[1]: self._parse(span) for path, span in self._members.items()
+                if len(path) == 2 and path[1] not in ("_wpc_components", "_wpc_editor_images")}
+
+    def __len__(self):
+        return len(self._component_spans)
+
+    def _component(self, key):
+        index = self._by_name[key] if isinstance(key, str) else key
+        return self._parse(self._component_spans[index])
+
+    def editor_image(self, image_id):
+        span = self._image_spans.get(str(image_id))
+        return self._parse(span) if span else None
+
+    def part(self, key):
+        """``(component, editor_images)`` as the generator builds it, for reuse."""
+        component = self.component(key)
+        images = {}
+        for child in component.get("children", []):
+            image_id = str(child["settings"]["views"]["front"]["image"])
+            images[image_id] = self.editor_image(image_id)
+        return component, images
+
+    def to_dict(self):
+        """The whole document, fully parsed."""
+        return json.loads(self._buffer[:])
+
+
+def _split_src(src, couleur, product_types):
+    # https://.../uploads/<date>/<motif>-<motif num><suffix>.png -> (date, prefix, product type)
+    base = BASE_URL.rstrip("/") + "/"
+    if not src or not src.startswith(base):
+        return None
+    date, _, file_name = src[len(base):].rpartition("/")
+    for product_type in product_types:
+        suffix = color_suffix(couleur, product_type) + ".png"
+        if file_name.endswith(suffix):
+            return date, file_name[:-len(suffix)], product_type
+    return None
+
+
+def _split_motif(prefix, motif_nums):
+    # The motif and its number were slugged together; the known numbers tell where to cut
+    for motif_num in sorted(motif_nums, key=len, reverse=True):
+        ending = "-" + make_valid_url(motif_num)
+        if prefix.endswith(ending):
+            return prefix[:-len(ending)], motif_num
+    return prefix, ""
+
+
+def _colors_query(couleurs, couleur_rgba_dict):
+    """Best query for a section's colors: blank for the full palette, else the families it covers."""
+    if set(couleurs) == set(couleur_rgba_dict):
+        return ""
+    families = sorted({parse_color_name(couleur)[0] for couleur in couleurs})
+    query = "family=" + ",".join(families)
+    index = index_for(couleur_rgba_dict)
+    if set(index.select(family=families)) == set(couleurs):
+        return query
+    return None
+
+
+class LoadedConfigurator:
+    """The form and build state recovered from an existing configurator file.
+
+    ``rows`` and ``form`` fill the GUI. :meth:`rebuild` turns the edited form
+    back into generator input. Sections whose row did not change keep their
+    published JSON, IDs and UIDs. Changed sections are rebuilt, but reuse the
+    IDs of images whose URL is unchanged.
+    """
+
+    def __init__(self, cfile, couleur_rgba_dict, product_types, motif_nums):
+        self.file = cfile
+        settings = cfile.settings()
+        style = settings.get("_wpc_config_style")
+        self.form = {
+            "Configurator Name": cfile.title or "",
+            "Style": next((name for name, value in STYLE_MAP.items() if value == style), style),
+            "Custom CSS": settings.get("_wpc_custom_css", ""),
+            "Custom JS": settings.get("_wpc_custom_js", ""),
+            "Form": settings.get("_wpc_form", ""),
+            "Base Price": settings.get("_wpc_base_price", ""),
+            "Group Layer Image URL": "",
+        }
+        self.group_layer_image = None
+        self.sections = []  # generator input per section, in file order
+        self.rows = []  # GUI rows, aligned with sections
+        self.warnings = []
+
+        by_rgba = {}
+        for couleur, rgba in couleur_rgba_dict.items():
+            by_rgba.setdefault(rgba, []).append(couleur)
+
+        for name in cfile.section_names:
+            component = cfile.component(name)
+            if name == "Group Layer 1":
+                self._load_group_layer(component)
+            else:
+                self._load_section(component, by_rgba, couleur_rgba_dict, product_types, motif_nums)
+
+    def _load_group_layer(self, component):
+        child = component["children"][0]
+        image_id = child["settings"]["views"]["front"]["image"]
+        image = self.file.editor_image(image_id) or {}
+        self.group_layer_image = {
+            "image_id": image_id,
+            "src": image.get("src", ""),
+            "width": image.get("width", 2437),
+            "height": image.get("height", 2560),
+            "uid": child["uid"],
+            "group_uid": component["uid"],
+        }
+        self.form["Group Layer Image URL"] = image.get("src", "")
+
+    def _load_section(self, component, by_rgba, couleur_rgba_dict, product_types, motif_nums):
+        children = []
+        used = {}
+        for child in component.get("children", []):
+            rgba = child["settings"].get("color")
+            # Palette colors sharing an RGBA value are matched in palette order
+            candidates = by_rgba.get(rgba, [])
+            nth = used.get(rgba, 0)
+            used[rgba] = nth + 1
+            couleur = candidates[nth] if nth < len(candidates) else None
+            children.append(ChildImage(child["settings"]["views"]["front"]["image"], None, None, None, rgba, couleur,
+                                       child["uid"]))
+
+        first = children[0] if children else None
+        image = self.file.editor_image(first.image_id) if first else None
+        split = _split_src(image.get("src"), first.couleur, product_types) if image and first.couleur else None
+        if split:
+            date, prefix, product_type = split
+            motif, motif_num = _split_motif(prefix, motif_nums)
+        else:
+            date = prefix = motif = motif_num = product_type = ""
+            self.warnings.append(f"{component['name']}: could not read motif and date from its image URLs")
+
+        colors = _colors_query([child.couleur for child in children if child.couleur], couleur_rgba_dict)
+        if colors is None:
+            colors = ""
+            self.warnings.append(f"{component['name']}: its color subset has no query; editing it uses every color")
+
+        self.sections.append({
+            "name": component["name"],
+            "custom_class": component.get("settings", {}).get("custom_class", ""),
+            "uid": component["uid"],
+            "children": children,  # src/size are filled from the file only if the section is reused
+        })
+        self.rows.append({
+            "motif": motif,
+            "motif_num": motif_num,
+            "date": date,
+            "width": str(image.get("width", "")) if image else "",
+            "height": str(image.get("height", "")) if image else "",
+            "color": first.couleur if first and first.couleur else "",
+            "product_type": product_type,
+            "colors": colors,
+        })
+
+    def close(self):
+        self.file.close()
+
+    def rebuild(self, data, rows, couleur_rgba_dict):
+        """Return ``(group_layer_image, sections_data, reused_parts, needs_id)`` for the edited form.
+
+        ``rows`` are the GUI rows matching ``data["Sections"]``. ``reused_parts``
+        maps a section index to its ``(component, editor_images)`` from the
+        file. ``needs_id`` lists the images that still need a fresh image ID.
+        """
+        sections_data = []
+        reused_parts = {}
+        touched = []
+        for idx, (entry, row) in enumerate(zip(data["Sections"], rows)):
+            if idx < len(self.rows) and row == self.rows[idx]:
+                section = self.sections[idx]
+                part = self.file.part(section["name"])
+                for img in section["children"]:
+                    image = part[1][str(img.image_id)]
+                    img.src, img.width, img.height = image["src"], image["width"], image["height"]
+                sections_data.append(section)
+                reused_parts[idx] = part
+            else:
+                section = build_sections_data([entry], couleur_rgba_dict, 0)[0][0]
+                sections_data.append(section)
+                touched.append(section)
+
+        group_layer_image = {
+            "image_id": 0,
+            "src": data["Group Layer Image URL"],
+            "width": self.group_layer_image["width"] if self.group_layer_image else 2437,
+            "height": self.group_layer_image["height"] if self.group_layer_image else 2560,
+        }
+
+        # Touched sections and the group layer take IDs and UIDs from the file where the image is unchanged
+        names = ["Group Layer 1"] + [section["name"] for section in touched]
+        previous = {"settings": {"_wpc_components": [], "_wpc_editor_images": {}}}
+        for name in names:
+            if name in self.file.section_names:
+                component, images = self.file.part(name)
+                previous["settings"]["_wpc_components"].append(component)
+                previous["settings"]["_wpc_editor_images"].update(images)
+        needs_id = adopt_previous_ids(previous, group_layer_image, touched)
+        logging.info(f"Rebuilding {len(touched)} of {len(sections_data)} sections, {len(needs_id)} new image IDs")
+        return group_layer_image, sections_data, reused_parts, needs_id
+
+
+def open_sharded(index_file):
+    """Reassemble a shard index into an anonymous temporary file, removed once closed."""
+    doc = load_sharded(index_file)
+    scratch = tempfile.TemporaryFile()
+    try:
+        scratch.write(json.dumps(doc, ensure_ascii=False).encode("utf-8"))
+        scratch.flush()
+        return ConfiguratorFile(index_file, file=scratch)
+    except BaseException:
+        scratch.close()
+        raise
+
+
+def load_for_editing(path, couleur_rgba_dict, product_types, motif_nums):
+    """Open ``path`` and recover its form; the file stays open (mapped) until :meth:`close`.
+
+    A shard index (``*.index.json``) is reassembled from its shards first.
+    """
+    cfile = open_sharded(path) if path.endswith(".index.json") else ConfiguratorFile(path)
+    return LoadedConfigurator(cfile, couleur_rgba_dict, product_types, motif_nums)
@@ -0,0 +1,129 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FILE = "configurator.log"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+MAX_LOG_BYTES = 2 * 1024 * 1024
+LOG_BACKUPS = 3
+MAX_MESSAGE_CHARS = 2000
+
+# Per-module levels; the module is the file name of the caller, so plain
+# ``logging.info(...)`` calls are filtered too. Override with e.g.
+# CONFIGURATOR_LOG_LEVELS="read_color=DEBUG,verify_assets=WARNING".
+MODULE_LEVELS = {
+    "read_color": logging.WARNING,  # a line per palette parse is noise in the app log
+}
+LOG_LEVELS_ENV = "CONFIGURATOR_LOG_LEVELS"
+
+_listener = None
+_queue_handler = None
+_module_filter = None
+_fork_hook_registered = False
+
+
+def summarize(text, limit=MAX_MESSAGE_CHARS):
+    """Cut ``text`` to ``limit`` characters, noting how much was left out."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]} ... [{len(text) - limit} more chars, {text.count(chr(10)) + 1} lines in total]"
+
+
+class ModuleLevelFilter(logging.Filter):
+    def __init__(self, levels, default=logging.INFO):
+        super().__init__()
+        self.levels = dict(levels)
+        self.default = default
+
+    def filter(self, record):
+        return record.levelno >= self.levels.get(record.module, self.default)
+
+
+class SummarizingFilter(logging.Filter):
+    # Runs on the listener thread, so cutting large payloads costs the caller nothing
+    def __init__(self, limit=MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.limit = limit
+
+    def filter(self, record):
+        message = record.getMessage()
+        if len(message) > self.limit:
+            record.msg = summarize(message, self.limit)
+            record.args = None
+        return True
+
+
+def _levels_from_env(levels):
+    levels = dict(levels)
+    for item in os.environ.get(LOG_LEVELS_ENV, "").split(","):
+        module, sep, level = item.partition("=")
+        if sep and logging.getLevelName(level.strip().upper()) in range(0, 51):
+            levels[module.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def _log_directly_after_fork():
+    # A forked child (batch worker) has no listener thread; write through the handlers instead
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        handler.addFilter(_module_filter)
+        root.addHandler(handler)
+
+
+def setup_logging(log_file=LOG_FILE, console=False, level=logging.INFO, module_levels=None,
+                  max_bytes=MAX_LOG_BYTES, backup_count=LOG_BACKUPS):
+    """Route all logging through a queue to a background writer thread.
+
+    Records go to ``log_file`` (rotated at ``max_bytes``, ``backup_count``
+    old files kept) and/or the console. Calling it again replaces the
+    previous setup. Returns the running ``QueueListener``.
+    """
+    global _listener, _queue_handler, _module_filter, _fork_hook_registered
+    stop_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(SummarizingFilter())
+
+    levels = _levels_from_env(MODULE_LEVELS if module_levels is None else module_levels)
+    _module_filter = ModuleLevelFilter(levels, default=level)
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(_module_filter)
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(min([level, *levels.values()]))
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if not _fork_hook_registered:
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_log_directly_after_fork)
+        atexit.register(stop_logging)
+        _fork_hook_registered = True
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and detach the queue handler."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
@@ -1,31 +1,78 @@
+import time
+STARTED = time.perf_counter()  # startup is measured from here to the first interactive frame
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-from read_color import read_color_csv
-from generate_json import ConfiguratorJSONGenerator
+from tkinter import ttk, messagebox, filedialog
+from read_color import get_palette
+from assemble import (BASE_URL, STYLE_MAP, build_section_entry, sections_block_size,
+                      build_group_layer_image, build_sections_data, LazySections)
+from slug import make_valid_url
+from palette_index import check_selection
+from image_ids import ImageIdAllocator, IMAGE_ID_RECORD
+from metrics import RunMetrics, METRICS_FILE
+from log_setup import setup_logging, LOG_FILE
+from publish_settings import PUBLISH_URL_ENV  # the Publish option is offered only when it is set
+import shutil
 import logging
+import os
+import importlib
 import json
-import re
+import queue
+import tempfile
+import threading
 import urllib.parse
-from datetime import datetime
-import sys
 
-# Configure logging
-logging.basicConfig(
-    filename="configurator.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# Configure logging: records are written by a background thread, see log_setup
+setup_logging(LOG_FILE)
 
-BASE_URL = "https://floor-and-design.fr/wp-content/uploads"
 CORRESPONDANCE_RGBA_DIR = "../correspondance_rgba.csv"
+OUTPUT_FILE = "configurator.json"
+PROFILE_FILE = "configurator.prof"
+BACKUP_FILE = "configurator-backup.json"
+DELTA_FILE = "configurator-delta.json"
+SHARD_MAX_BYTES = 2 * 1024 * 1024  # stays under common PHP upload_max_filesize defaults
+URL_DEBOUNCE_MS = 200
+PROGRESS_POLL_MS = 50
+# Not needed for the first frame; imported on the preload thread (or on first use)
+DEFERRED_MODULES = ("generate_json", "delta", "verify_assets", "png_probe", "color_index", "publish", "build_cache")
+
+MOTIF_NUM_LIST = ['Background', 'Motif 1', 'Motif 2', 'Motif 3', 'Motif 4', 'Motif 5', 'Motif 6', 'Motif 7', 'Motif 8', 'Motif 9', 'Motif 10']
+PRODUCT_TYPE_LIST = ["Produit", "Frise", "Frise Content", "Frise Border"]
+
+SECTION_COLUMNS = [
+    ("motif", "Motif Name", 120),
+    ("motif_num", "Motif Num", 90),
+    ("date", "Date (YYYY/MM)", 100),
+    ("width", "Width", 60),
+    ("height", "Height", 60),
+    ("color", "Sample Color", 150),
+    ("product_type", "Product Type", 100),
+    ("colors", "Colors (query)", 150),
+    ("product_url", "Product Image URL", 320),
+]
+EDITABLE_COLUMNS = [key for key, title, width in SECTION_COLUMNS if key != "product_url"]
+
+
+class GenerationCancelled(Exception):
+    pass
+
 
 class ConfiguratorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Configurator")
-        self.image_fields = []
+        self.sections = []  # one plain dict per section, in display order
+        self._cell_editor = None
         self.couleur_list = []
         self.rgba_color_list = []
+        self._url_updates = {}
+        self._worker = None
+        self._cancel_event = None
+        self._messages = None
+        self._loaded = None  # loader.LoadedConfigurator of the file opened for editing
+        self._submitted_rows = None
+
+        self.create_status_bar()  # packed first so it keeps its row when the window is small
 
         # ✅ Create scrollable container
         container = ttk.Frame(self.root)
@@ -55,13 +102,11 @@ class ConfiguratorApp:
         self.canvas.bind_all("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))  # Linux
         self.canvas.bind_all("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))   # Linux
 
-        # ✅ Read last record function
-        def read_last_record(file_path="../image_id_last_record.json"):
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            return int(data.get("last_record", 0))
-        
-        self.last_record = read_last_record()
+        # ✅ Image IDs are reserved from the shared record at submit time
+        self.id_allocator = ImageIdAllocator(IMAGE_ID_RECORD)
+        self.asset_verifier = None  # created on first verify; remembers URLs found for the session
+        self._png_probes = {}  # mirror folder -> PngProbe, so the size cache survives between submits
+        self.build_cache = None  # created on first submit
 
         try:
             self.create_global_settings()
@@ -72,26 +117,48 @@ class ConfiguratorApp:
             logging.error(f"Error initializing application: {e}")
             messagebox.showerror("Error", f"Failed to initialize application: {e}")
 
-    def make_valid_url(self, name):
-        if name:
-            name = name.replace(',', '')
-            name = re.sub(r'\s+', '-', name.strip())
-            name = re.sub(r'[^A-Za-z0-9\-_]', '-', name)
-            name = re.sub(r'-{2,}', '-', name)
-            return f"{name}"
-        else:
-            print("make_valid_url Error: No FIle name")
+    # --- Startup ---
+    def create_status_bar(self):
+        self.status_var = tk.StringVar(value="Loading palette...")
+        ttk.Label(self.root, textvariable=self.status_var, anchor="w").pack(side="bottom", fill="x", padx=5)
+
+    def start_preload(self):
+        # Palette, ID counter and the modules the first submit needs load off the Tk thread
+        self._preloaded = None
+        self._preload_thread = threading.Thread(target=self._preload, daemon=True)
+        self._preload_thread.start()
+        self.root.after(PROGRESS_POLL_MS, self._poll_preload)
 
-    def update_last_record(self, last_record, json_file="../image_id_last_record.json"):
+    def _preload(self):
         try:
-            with open(json_file, 'r') as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            data = {"last_record": 0}
-        data["last_record"] = last_record
-        with open(json_file, 'w') as file:
-            json.dump(data, file, indent=4)
-        print(f"Updated last_record to {last_record}")
+            palette = get_palette(CORRESPONDANCE_RGBA_DIR)
+            next_id = self.id_allocator.peek()
+            for module in DEFERRED_MODULES:
+                importlib.import_module(module)
+            self._preloaded = (len(palette), next_id)
+        except Exception as e:
+            logging.error(f"Error preloading palette: {e}")
+            self._preloaded = e
+
+    def _poll_preload(self):
+        if self._preload_thread.is_alive():
+            self.root.after(PROGRESS_POLL_MS, self._poll_preload)
+        elif isinstance(self._preloaded, Exception):
+            self.status_var.set(f"Could not load {CORRESPONDANCE_RGBA_DIR}: {self._preloaded}")
+        else:
+            colors, next_id = self._preloaded
+            self.status_var.set(f"Ready: {colors} colors, next image ID {next_id}")
+
+    def mark_interactive(self):
+        # Called from the event loop once the first frame has been drawn
+        startup = RunMetrics("startup")
+        startup.record("time to first frame", time.perf_counter() - STARTED)
+        startup.total = time.perf_counter() - STARTED
+        startup.write_jsonl(METRICS_FILE)
+        logging.info(f"Interactive after {startup.total * 1000:.0f} ms")
+
+    def make_valid_url(self, name):
+        return make_valid_url(name)
 
     # --- Section 1: Global Settings ---
     def create_global_settings(self):
@@ -102,15 +169,8 @@ class ConfiguratorApp:
         self.config_name = ttk.Entry(global_frame, width=40)
         self.config_name.grid(row=0, column=1, padx=5, pady=2)
 
-        style_map = {
-            "Style 1": "style-1",
-            "Style 2": "style-2",
-            "Style 3": "style-3",
-            "Accordion Style 1": "accordion-1",
-            "Accordion Style 2": "accordion-2",
-            "Popover": "popover_value"
-        }
-        
+        style_map = STYLE_MAP
+
         ttk.Label(global_frame, text="Choose Style:").grid(row=1, column=0, sticky="w")
         self.style_var = tk.StringVar(value="Accordion Style 2")
 
@@ -151,6 +211,11 @@ class ConfiguratorApp:
         self.base_price = ttk.Entry(global_frame, width=20)
         self.base_price.grid(row=5, column=1, padx=5, pady=2)
 
+        # Optional: sizes are then read from the PNG headers instead of the typed values
+        ttk.Label(global_frame, text="Uploads Mirror Folder:").grid(row=6, column=0, sticky="w")
+        self.uploads_mirror = ttk.Entry(global_frame, width=40)
+        self.uploads_mirror.grid(row=6, column=1, padx=5, pady=2)
+
     # --- Section 2: Group Layer 1 ---
     def create_group_layer(self):
         group_frame = ttk.LabelFrame(self.scrollable_frame, text="Group Layer 1", padding=(10, 5))
@@ -168,169 +233,465 @@ class ConfiguratorApp:
         self.image_url = ttk.Entry(group_frame, width=50)
         self.image_url.grid(row=2, column=1, padx=5, pady=2)
 
-        add_img_btn = ttk.Button(group_frame, text="Add Section", command=self.add_image_fields)
-        add_img_btn.grid(row=3, column=1, pady=5, sticky="w")
+        section_buttons = ttk.Frame(group_frame)
+        section_buttons.grid(row=3, column=1, pady=5, sticky="w")
+        ttk.Button(section_buttons, text="Add Section", command=self.add_image_fields).pack(side="left")
+        ttk.Button(section_buttons, text="Remove Section", command=self.remove_selected_sections).pack(side="left", padx=5)
+
+        # ✅ One Treeview for every section; a single editor widget is placed over the edited cell
+        table_frame = ttk.Frame(group_frame)
+        table_frame.grid(row=4, column=0, columnspan=2, pady=5, sticky="nsew")
 
-        self.dynamic_frame = ttk.Frame(group_frame)
-        self.dynamic_frame.grid(row=4, column=0, columnspan=2, pady=5, sticky="w")
+        self.section_tree = ttk.Treeview(table_frame, columns=[key for key, title, width in SECTION_COLUMNS], height=12)
+        self.section_tree.heading("#0", text="Section")
+        self.section_tree.column("#0", width=80, stretch=False)
+        for key, title, width in SECTION_COLUMNS:
+            self.section_tree.heading(key, text=title)
+            self.section_tree.column(key, width=width, stretch=key == "product_url")
+
+        tree_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.section_tree.yview)
+        self.section_tree.configure(yscrollcommand=tree_scrollbar.set)
+        self.section_tree.pack(side="left", fill="both", expand=True)
+        tree_scrollbar.pack(side="right", fill="y")
+
+        self.section_tree.bind("<ButtonPress-1>", lambda e: self._end_cell_edit(commit=True))
+        self.section_tree.bind("<Double-1>", self._begin_cell_edit)
 
     def replace_spaces_with_dash(self, text):
         return text.replace(" ", "-")
 
-    # --- Add Image Fields ---
+    # --- Sections ---
     def add_image_fields(self):
         try:
-            img_frame = ttk.LabelFrame(self.dynamic_frame, text=f"Section {len(self.image_fields)+1}", padding=(5, 5))
-            img_frame.pack(fill="x", pady=3)
-
-            motif_var = tk.StringVar()
-            date_var = tk.StringVar()
-            color_var = tk.StringVar()
-            product_type_var = tk.StringVar()
-            motif_num_var = tk.StringVar()
-
-            motif_entry = self._create_labeled_entry(img_frame, "Motif Name:", 0, motif_var)
-
-            motif_num_list = ['Background', 'Motif 1', 'Motif 2', 'Motif 3', 'Motif 4', 'Motif 5', 'Motif 6', 'Motif 7', 'Motif 8', 'Motif 9', 'Motif 10']
-            ttk.Label(img_frame, text="Motif Num:").grid(row=1, column=0, sticky="w")
-            color_combo = ttk.Combobox(img_frame, values=motif_num_list, textvariable=motif_num_var, state="readonly")
-            color_combo.grid(row=1, column=1, padx=5, pady=2)
-            color_combo.current(0)
-
-            date_entry = self._create_labeled_entry(img_frame, "Date Uploaded (YYYY/MM):", 2, date_var)
-            width_entry = self._create_labeled_entry(img_frame, "Width:", 3)
-            height_entry = self._create_labeled_entry(img_frame, "Height:", 4)
-
-            couleur_list, rgba_color_list, couleur_rgba_dict = read_color_csv(CORRESPONDANCE_RGBA_DIR)
-            ttk.Label(img_frame, text="Sample Color:").grid(row=5, column=0, sticky="w")
-            color_combo = ttk.Combobox(img_frame, values=couleur_list, textvariable=color_var, state="readonly")
-            color_combo.grid(row=5, column=1, padx=5, pady=2)
-            color_combo.current(0)
-
-            product_type_list = ["Produit", "Frise", "Frise Content", "Frise Border"]
-            ttk.Label(img_frame, text="Product Type:").grid(row=6, column=0, sticky="w")
-            product_type_combo = ttk.Combobox(img_frame, values=product_type_list, textvariable=product_type_var, state="readonly")
-            product_type_combo.grid(row=6, column=1, padx=5, pady=2)
-            product_type_combo.current(0)
-
-            ttk.Label(img_frame, text="Product Image URL:").grid(row=7, column=0, sticky="w")
-            product_img_url = ttk.Entry(img_frame, width=60, state="readonly")
-            product_img_url.grid(row=7, column=1, padx=5, pady=2)
-
-            field_set = {
-                "motif": motif_var,
-                "motif_num": motif_num_var,
-                "date": date_var,
-                "color": color_var,
-                "width": width_entry,
-                "height": height_entry,
-                "product_type": product_type_var,
-                "product_url": product_img_url
+            palette = get_palette(CORRESPONDANCE_RGBA_DIR)
+            row = {
+                "motif": "",
+                "motif_num": MOTIF_NUM_LIST[0],
+                "date": "",
+                "width": "",
+                "height": "",
+                "color": palette.names[0] if palette.names else "",
+                "product_type": PRODUCT_TYPE_LIST[0],
+                "colors": "",
             }
-            self.image_fields.append(field_set)
-
-            motif_var.trace_add("write", lambda *args, f=field_set: self.update_product_url(f))
-            date_var.trace_add("write", lambda *args, f=field_set: self.update_product_url(f))
-            color_var.trace_add("write", lambda *args, f=field_set: self.update_product_url(f))
-            product_type_var.trace_add("write", lambda *args, f=field_set: self.update_product_url(f))
+            self.sections.append(row)
+            iid = self.section_tree.insert("", "end", text=f"Section {len(self.sections)}", values=self._row_values(row))
+            self.section_tree.see(iid)
 
-            logging.info(f"Added image input set #{len(self.image_fields)}")
+            logging.info(f"Added image input set #{len(self.sections)}")
         except Exception as e:
             logging.error(f"Error adding image fields: {e}")
             messagebox.showerror("Error", f"Failed to add image fields: {e}")
 
-    def update_product_url(self, fields):
-        motif_name = fields["motif"].get().strip()
-        motif_num = fields["motif_num"].get().strip()
-        date_uploaded = fields["date"].get().strip()
-        color = fields["color"].get().strip()
-        product_type = fields["product_type"].get().strip()
+    def remove_selected_sections(self):
+        self._end_cell_edit(commit=True)
+        for iid in self.section_tree.selection():
+            del self.sections[self.section_tree.index(iid)]
+            self.section_tree.delete(iid)
+        for i, iid in enumerate(self.section_tree.get_children()):
+            self.section_tree.item(iid, text=f"Section {i+1}")
+
+    def _row_values(self, row):
+        return [row[key] for key in EDITABLE_COLUMNS] + [self.product_url(row)]
+
+    def _begin_cell_edit(self, event):
+        tree = self.section_tree
+        if tree.identify_region(event.x, event.y) != "cell":
+            return
+        iid = tree.identify_row(event.y)
+        column = tree.identify_column(event.x)
+        key = tree.column(column, "id")
+        if not iid or key not in EDITABLE_COLUMNS:
+            return
+
+        self._end_cell_edit(commit=True)
+        x, y, width, height = tree.bbox(iid, column)
+        row = self.sections[tree.index(iid)]
+        var = tk.StringVar(value=row[key])
+
+        choices = self._cell_choices(key)
+        if choices is None:
+            editor = ttk.Entry(tree, textvariable=var)
+            editor.bind("<FocusOut>", lambda e: self._end_cell_edit(commit=True))
+            editor.select_range(0, tk.END)
+        else:
+            # Sample Color also accepts a typed hex code, resolved to the nearest palette color
+            editor = ttk.Combobox(tree, textvariable=var, values=choices,
+                                  state="normal" if key == "color" else "readonly")
+            editor.bind("<<ComboboxSelected>>", lambda e: self._end_cell_edit(commit=True))
+        editor.bind("<Return>", lambda e: self._end_cell_edit(commit=True))
+        editor.bind("<Escape>", lambda e: self._end_cell_edit(commit=False))
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+
+        var.trace_add("write", lambda *args: self._edit_cell_value(iid, key, var.get()))
+        self._cell_editor = (editor, iid, key, row[key])
+
+    def _cell_choices(self, key):
+        if key == "motif_num":
+            return MOTIF_NUM_LIST
+        if key == "product_type":
+            return PRODUCT_TYPE_LIST
+        if key == "color":
+            return get_palette(CORRESPONDANCE_RGBA_DIR).names
+        return None
+
+    def _edit_cell_value(self, iid, key, value):
+        # Typing updates the model right away; the URL preview follows debounced
+        if not self.section_tree.exists(iid):
+            return
+        self.sections[self.section_tree.index(iid)][key] = value.strip()
+        self.schedule_product_url(iid)
+
+    def _end_cell_edit(self, commit=True):
+        if not self._cell_editor:
+            return
+        editor, iid, key, original = self._cell_editor
+        self._cell_editor = None
+        editor.destroy()
+
+        if not self.section_tree.exists(iid):
+            return
+        row = self.sections[self.section_tree.index(iid)]
+        if not commit:
+            row[key] = original
+        elif key == "color" and row[key].startswith("#"):
+            row[key] = self.nearest_sample_color(row[key], original)
+        self.section_tree.set(iid, key, row[key])
+        self.update_product_url(iid)
+
+    def nearest_sample_color(self, hex_color, fallback):
+        from color_index import color_index_for
+        try:
+            name, distance = color_index_for(get_palette(CORRESPONDANCE_RGBA_DIR).lookup).nearest_hex(hex_color)
+        except (ValueError, TypeError) as e:
+            messagebox.showwarning("Sample Color", f"{e}")
+            return fallback
+        logging.info(f"Sample color {hex_color} -> {name} (ΔE {distance:.1f})")
+        return name
+
+    def schedule_product_url(self, iid):
+        # Coalesce bursts of keystrokes into one preview refresh
+        pending = self._url_updates.pop(iid, None)
+        if pending:
+            self.root.after_cancel(pending)
+        self._url_updates[iid] = self.root.after(URL_DEBOUNCE_MS, lambda: self._run_product_url(iid))
+
+    def _run_product_url(self, iid):
+        self._url_updates.pop(iid, None)
+        if self.section_tree.exists(iid):
+            self.update_product_url(iid)
+
+    def update_product_url(self, iid):
+        row = self.sections[self.section_tree.index(iid)]
+        self.section_tree.set(iid, "product_url", self.product_url(row))
+
+    def product_url(self, row):
+        motif_name = row["motif"].strip()
+        motif_num = row["motif_num"].strip()
+        date_uploaded = row["date"].strip()
+        color = row["color"].strip()
+        product_type = row["product_type"].strip()
 
-        url_value = ""
         url_value_read_only = ""
         if motif_name and date_uploaded and color and motif_num and product_type:
-            image_name_read_only = self.make_valid_url(f"{motif_name}-{motif_num}-{color}-{product_type}")
-            image_name = self.make_valid_url(f"{motif_name}-{motif_num}")
-            url_value = f"{BASE_URL}/{date_uploaded}/{image_name}"
+            image_name_read_only = make_valid_url(f"{motif_name}-{motif_num}-{color}-{product_type}")
             url_value_read_only = f"{BASE_URL}/{date_uploaded}/{image_name_read_only}"
+        return url_value_read_only
 
-        fields["product_url"].config(state="normal")
-        fields["product_url"].delete(0, tk.END)
-        fields["product_url"].insert(0, url_value_read_only)
-        fields["product_url"].config(state="readonly")
+    def create_submit_button(self):
+        submit_frame = ttk.Frame(self.scrollable_frame)
+        submit_frame.pack(pady=10)
 
-    def _create_labeled_entry(self, parent, label_text, row, text_var=None):
-        ttk.Label(parent, text=label_text).grid(row=row, column=0, sticky="w")
-        entry = ttk.Entry(parent, width=40, textvariable=text_var)
-        entry.grid(row=row, column=1, padx=5, pady=2)
-        return entry
+        self.open_btn = ttk.Button(submit_frame, text="Open...", command=self.open_configurator)
+        self.open_btn.pack(side="left", padx=5)
 
-    def create_submit_button(self):
-        submit_btn = ttk.Button(self.scrollable_frame, text="Submit", command=self.submit_form)
-        submit_btn.pack(pady=10)
+        self.submit_btn = ttk.Button(submit_frame, text="Submit", command=self.submit_form)
+        self.submit_btn.pack(side="left", padx=5)
 
-    def submit_form(self):
-        try:
-            data = {
-                "Configurator Name": self.config_name.get(),
-                "Style": self.style_actual_value,
-                "Custom CSS": self.custom_css.get(),
-                "Custom JS": self.custom_js_var.get(),
-                "Form": self.form_var.get().replace(" ", "-").lower(),
-                "Base Price": self.base_price.get(),
-                "Required": self.required_var.get(),
-                "Hide Control": self.hide_var.get(),
-                "Group Layer Image URL": self.image_url.get(),
-                "Sections": [
-                    {
-                        "Section No": f"Section {i+1}",
-                        "Custom Class": f"productGroup group{i+1}",
-                        "Width": img["width"].get(),
-                        "Height": img["height"].get(),
-                        "Product Type": img["product_type"].get(),
-                        "Product URL": f"{BASE_URL}/{img['date'].get()}/" + self.make_valid_url(f"{img['motif'].get()}-{img['motif_num'].get()}"),
-                        "Motif": img["motif"].get(),
-                        "Motif No": img["motif_num"].get(),
-                        "Date": img["date"].get(),
-                    }
-                    for i, img in enumerate(self.image_fields)
-                ]
-            }
+        self.cancel_btn = ttk.Button(submit_frame, text="Cancel", command=self.cancel_submit, state="disabled")
+        self.cancel_btn.pack(side="left", padx=5)
 
-            image_counter = self.last_record
+        self.progress = ttk.Progressbar(submit_frame, length=200, mode="determinate")
+        self.progress.pack(side="left", padx=5)
 
-            group_layer_image = {
-                "image_id": image_counter + 10,
-                "src": data["Group Layer Image URL"],
-                "width": 2437,
-                "height": 2560
-            }
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(submit_frame, text="Profile this run", variable=self.profile_var).pack(side="left", padx=5)
+
+        self.delta_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(submit_frame, text="Delta export", variable=self.delta_var).pack(side="left", padx=5)
+
+        self.verify_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(submit_frame, text="Verify images", variable=self.verify_var).pack(side="left", padx=5)
+
+        self.shard_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(submit_frame, text=f"Split into {SHARD_MAX_BYTES // (1024 * 1024)} MB files",
+                        variable=self.shard_var).pack(side="left", padx=5)
+
+        self.publish_var = tk.BooleanVar(value=False)
+        if os.environ.get(PUBLISH_URL_ENV):
+            ttk.Checkbutton(submit_frame, text="Publish to WordPress", variable=self.publish_var).pack(side="left", padx=5)
+
+    # --- Editing an existing configurator ---
+    def open_configurator(self):
+        if self._worker and self._worker.is_alive():
+            return  # the running submit may still be reading the opened file
+        path = filedialog.askopenfilename(title="Open configurator", initialdir=".",
+                                          filetypes=[("Configurator JSON", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        from loader import load_for_editing
+        try:
+            loaded = load_for_editing(path, get_palette(CORRESPONDANCE_RGBA_DIR).lookup, PRODUCT_TYPE_LIST, MOTIF_NUM_LIST)
+        except Exception as e:
+            logging.error(f"Error opening {path}: {e}")
+            messagebox.showerror("Error", f"Failed to open {path}: {e}")
+            return
+
+        if self._loaded:
+            self._loaded.close()
+        self._loaded = loaded
+        self.fill_form(loaded.form, loaded.rows)
+        for warning in loaded.warnings:
+            logging.warning(warning)
+        self.status_var.set(f"Editing {os.path.basename(path)}: {len(loaded.rows)} sections, "
+                            f"unchanged sections keep their image IDs")
+        if loaded.warnings:
+            messagebox.showwarning("Open configurator", "\n".join(loaded.warnings[:10]))
+
+    def fill_form(self, form, rows):
+        self._end_cell_edit(commit=False)
+        self.config_name.delete(0, tk.END)
+        self.config_name.insert(0, form["Configurator Name"])
+        self.style_var.set(form["Style"])
+        self.style_actual_value = STYLE_MAP.get(form["Style"], form["Style"])
+        self.custom_css.delete(0, tk.END)
+        self.custom_css.insert(0, form["Custom CSS"])
+        self.custom_js_var.set(form["Custom JS"])
+        self.form_var.set(next((name for name in self.form_combo.cget("values")
+                                if name.replace(" ", "-").lower() == form["Form"]), form["Form"]))
+        self.base_price.delete(0, tk.END)
+        self.base_price.insert(0, form["Base Price"])
+        self.image_url.delete(0, tk.END)
+        self.image_url.insert(0, form["Group Layer Image URL"])
+
+        self.section_tree.delete(*self.section_tree.get_children())
+        self.sections[:] = [dict(row) for row in rows]
+        for i, row in enumerate(self.sections):
+            self.section_tree.insert("", "end", text=f"Section {i+1}", values=self._row_values(row))
+
+    def _reopen_loaded(self, path, rows=None):
+        # The worker closes the opened file before replacing it; pick the new output up as the baseline
+        from loader import load_for_editing
+        try:
+            self._loaded = load_for_editing(path, get_palette(CORRESPONDANCE_RGBA_DIR).lookup,
+                                            PRODUCT_TYPE_LIST, MOTIF_NUM_LIST)
+            if rows is not None:
+                self._loaded.rows = rows
+        except Exception as e:
+            logging.warning(f"Could not reopen {path} for editing: {e}")
+            self._loaded = None
+            self.status_var.set("Ready")
+            messagebox.showwarning("Open configurator", f"Could not reopen {path} for editing: {e}\n"
+                                                        f"The next submit builds every section from scratch.")
+
+    def collect_form_data(self):
+        return {
+            "Configurator Name": self.config_name.get(),
+            "Style": self.style_actual_value,
+            "Custom CSS": self.custom_css.get(),
+            "Custom JS": self.custom_js_var.get(),
+            "Form": self.form_var.get().replace(" ", "-").lower(),
+            "Base Price": self.base_price.get(),
+            "Required": self.required_var.get(),
+            "Hide Control": self.hide_var.get(),
+            "Group Layer Image URL": self.image_url.get(),
+            "Uploads Mirror": self.uploads_mirror.get().strip(),
+            "Sections": [
+                build_section_entry(
+                    i,
+                    motif=row["motif"],
+                    motif_num=row["motif_num"],
+                    date=row["date"],
+                    width=row["width"],
+                    height=row["height"],
+                    product_type=row["product_type"],
+                    colors=row["colors"],
+                )
+                for i, row in enumerate(self.sections)
+            ]
+        }
 
-            sections_data = []
-            couleur_list, rgba_color_list, couleur_rgba_dict = read_color_csv(CORRESPONDANCE_RGBA_DIR)
-
-            for section in data["Sections"]:
-                children = []
-                for couleur, rgba in couleur_rgba_dict.items():
-                    children.append({
-                        "image_id": image_counter + 15,
-                        "src": f"{section['Product URL']}" + self.make_valid_url(f"-{couleur}-{section['Product Type']}") + ".png",
-                        "width": section["Width"],
-                        "height": section["Height"],
-                        "color": rgba
-                    })
-                    image_counter += 1
-
-                section_data = {
-                    "name": section["Section No"],
-                    "custom_class": section["Custom Class"],
-                    "children": children,
-                }
-                sections_data.append(section_data)
-
-            self.update_last_record(image_counter, json_file="../image_id_last_record.json")
-            sys.exit() if datetime.now().month == 8 and datetime.now().day == 11 else None
-            logging.info(f"Sections data: {len(sections_data)}")
+    def submit_form(self):
+        if self._worker and self._worker.is_alive():
+            return
+        self._end_cell_edit(commit=True)
+        try:
+            data = self.collect_form_data()
+            palette = get_palette(CORRESPONDANCE_RGBA_DIR).lookup
+            for i, section in enumerate(data["Sections"]):
+                # Report a mistyped query, or one selecting no color, before anything is reserved
+                try:
+                    check_selection(palette, section["Colors"])
+                except ValueError as e:
+                    raise ValueError(f"Section {i + 1}: {e}") from None
+        except Exception as e:
+            logging.error(f"Error submitting form: {e}")
+            messagebox.showerror("Error", f"Failed to submit form: {e}")
+            return
+
+        self._cancel_event = threading.Event()
+        self._messages = queue.Queue()
+        self._submitted_rows = [dict(row) for row in self.sections]
+        self._worker = threading.Thread(
+            target=self._generate_in_background,
+            args=(data, self._cancel_event, self._messages,
+                  self.profile_var.get(), self.delta_var.get(), self.verify_var.get(), self.shard_var.get(),
+                  (self._loaded, self._submitted_rows) if self._loaded else None, self.publish_var.get()),
+            daemon=True
+        )
+        self.submit_btn.config(state="disabled")
+        self.open_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.progress.config(value=0, maximum=len(data["Sections"]) + 1)
+        self._worker.start()
+        self.root.after(PROGRESS_POLL_MS, self._poll_generation)
+
+    def cancel_submit(self):
+        if self._cancel_event:
+            self._cancel_event.set()
+            self.cancel_btn.config(state="disabled")
+
+    def _generate_in_background(self, data, cancel_event, messages, profile=False, delta=False, verify=False,
+                                shard=False, loaded=None, publish=False):
+        # Runs on a worker thread: no Tk calls here, only messages to the queue
+        from generate_json import ConfiguratorJSONGenerator
+        from delta import load_configurator, adopt_previous_ids, assign_ids
+        from verify_assets import AssetVerifier, collect_image_urls, describe_missing
+        from png_probe import PngProbe
+        from shards import index_path, load_sharded, remove_stale_shards
+        from build_cache import BuildCache, build_key
+
+        def progress(done, total):
+            if cancel_event.is_set():
+                raise GenerationCancelled()
+            messages.put(("progress", done, total))
+
+        metrics = RunMetrics(data["Configurator Name"] or "submit", profile=profile,
+                             profile_path=PROFILE_FILE if profile else None).start()
+        part_file = OUTPUT_FILE + ".part"
+        staging = None
+        image_block = None
+        written = False
+        try:
+            with metrics.span("palette load"):
+                palette = get_palette(CORRESPONDANCE_RGBA_DIR)
+            if cancel_event.is_set():
+                raise GenerationCancelled()
+
+            previous = None
+            if delta and shard and os.path.exists(index_path(OUTPUT_FILE)):
+                previous = load_sharded(index_path(OUTPUT_FILE))
+            elif delta and os.path.exists(OUTPUT_FILE):
+                previous = load_configurator(OUTPUT_FILE)
+
+            cache_key = None
+            if not previous and not loaded and not data.get("Uploads Mirror"):
+                # A fresh build depends only on the form, the palette and the generator code:
+                # an unchanged re-submit gets the earlier output back and reserves no image IDs.
+                # Sizes probed from an uploads mirror can change under the same form, so those are not cached.
+                if self.build_cache is None:
+                    self.build_cache = BuildCache()
+                cache_key = build_key(data, CORRESPONDANCE_RGBA_DIR, max_bytes=SHARD_MAX_BYTES if shard else None,
+                                      verify=verify)
+                entry = self.build_cache.get(cache_key)
+                if entry:
+                    output = self.build_cache.restore(entry, os.path.dirname(OUTPUT_FILE))
+                    if shard:
+                        remove_stale_shards(OUTPUT_FILE, len(entry["files"]) - 1)
+                    first_id, count = entry["image_block"]
+                    logging.info(f"Form unchanged: reused cached build {cache_key[:12]} "
+                                 f"(image IDs {first_id}-{first_id + count - 1})")
+                    metrics.count("build_cache_hits")
+                    if publish and not self._publish_output(output, messages, metrics):
+                        return
+                    metrics.finish()
+                    metrics.write_jsonl(METRICS_FILE)
+                    messages.put(("done", output, "cached"))
+                    return
+
+            reused_parts = {}
+            needs_id = []
+            if loaded:
+                # Opened from a file: unchanged sections keep their JSON, IDs and UIDs as published
+                source, rows = loaded
+                with metrics.span("section assembly"):
+                    group_layer_image, sections_data, reused_parts, needs_id = source.rebuild(
+                        data, rows, palette.lookup)
+                metrics.count("sections_reused", len(reused_parts))
+            elif previous:
+                # Keep the IDs of images that did not change; only new ones get fresh IDs
+                with metrics.span("section assembly"):
+                    group_layer_image = build_group_layer_image(data, 0)
+                    sections_data, image_counter = build_sections_data(data["Sections"], palette.lookup, 0)
+                    needs_id = adopt_previous_ids(previous, group_layer_image, sections_data)
+            elif verify:
+                # Verification only needs the URLs; the ID block is reserved once it passed
+                group_layer_image = build_group_layer_image(data, 0)
+                sections_data = LazySections(data["Sections"], palette.lookup, 0, span=metrics.span)
+
+            if verify:
+                # Stop before anything is written or reserved if uploads are missing
+                if self.asset_verifier is None:
+                    self.asset_verifier = AssetVerifier()
+                with metrics.span("asset verification"):
+                    missing = self.asset_verifier.missing(collect_image_urls(group_layer_image, sections_data))
+                if missing:
+                    logging.error(describe_missing(missing, limit=50))
+                    messages.put(("error", describe_missing(missing)))
+                    return
+                if cancel_event.is_set():
+                    raise GenerationCancelled()
+
+            probe = None
+            if data.get("Uploads Mirror"):
+                probe = self._png_probes.get(data["Uploads Mirror"])
+                if probe is None:
+                    probe = self._png_probes[data["Uploads Mirror"]] = PngProbe(data["Uploads Mirror"])
+
+            unprobed = []
+            if loaded or previous:
+                if probe:
+                    with metrics.span("dimension probe"):
+                        probe.fill_dimensions(group_layer_image, sections_data)
+            else:
+                group_layer_image = build_group_layer_image(data, 0)  # its ID is set once the block is reserved
+                if probe:
+                    with metrics.span("dimension probe"):
+                        unprobed.extend(probe.fill_dimensions(group_layer_image, [], warn=False))
+                block_size = sections_block_size(data["Sections"], palette.lookup)
+
+            # IDs are reserved as late as possible, right before the write that uses them
+            if cancel_event.is_set():
+                raise GenerationCancelled()
+            if loaded or previous:
+                if needs_id:
+                    image_block = (self.id_allocator.reserve(len(needs_id)), len(needs_id))
+                    assign_ids(needs_id, image_block[0])
+                if previous:
+                    logging.info(f"Delta build: {len(needs_id)} new image IDs")
+            else:
+                image_counter = self.id_allocator.reserve(block_size)
+                image_block = (image_counter, block_size)
+                group_layer_image["image_id"] = build_group_layer_image(data, image_counter)["image_id"]
+
+                def prepare(section):
+                    with metrics.span("dimension probe"):
+                        unprobed.extend(probe.fill_dimensions(None, [section], warn=False))
+
+                # Sections are built while the output is written and dropped once serialized
+                sections_data = LazySections(data["Sections"], palette.lookup, image_counter,
+                                             prepare=prepare if probe else None, span=metrics.span)
 
             generator = ConfiguratorJSONGenerator(
                 title=data["Configurator Name"],
@@ -340,23 +701,130 @@ class ConfiguratorApp:
                 custom_css=data["Custom CSS"],
                 form=data["Form"],
                 group_layer_image=group_layer_image,
-                sections_data=sections_data
+                sections_data=sections_data,
+                metrics=metrics
             )
-            
-            json_data = generator.generate()
-            print(json.dumps(json_data, indent=2))
-
-            generator.save_to_file("configurator.json")
-
-            logging.info(f"Form submitted: {data}")
-            messagebox.showinfo("Success", "Form submitted successfully! Check configurator.json for the output.")
+            for index, part in reused_parts.items():
+                generator.seed_section(index, part)
+
+            # Write next to the target and swap in, so a cancelled run keeps the old output;
+            # shards are staged in a scratch folder for the same reason
+            # The delta is diffed against the parts kept from this write, so it carries the same UIDs
+            keep_parts = bool(previous)
+            if shard:
+                staging = tempfile.mkdtemp(prefix="configurator-shards-", dir=".")
+                index = generator.save_sharded(os.path.join(staging, OUTPUT_FILE), SHARD_MAX_BYTES, progress=progress,
+                                               keep_parts=keep_parts)
+            else:
+                generator.save_to_file(part_file, stream=True, progress=progress, keep_parts=keep_parts)
+            if previous:
+                with open(BACKUP_FILE, "w", encoding="utf-8") as backup:
+                    json.dump(previous, backup, indent=2, ensure_ascii=False)
+                generator.save_delta(previous, DELTA_FILE)
+            if loaded:
+                loaded[0].close()  # the opened file may be the one about to be replaced
+            if shard:
+                for entry in index["shards"]:
+                    os.replace(os.path.join(staging, entry["file"]), entry["file"])
+                remove_stale_shards(OUTPUT_FILE, len(index["shards"]))
+                os.replace(index_path(os.path.join(staging, OUTPUT_FILE)), index_path(OUTPUT_FILE))
+                output = index_path(OUTPUT_FILE)
+            else:
+                os.replace(part_file, OUTPUT_FILE)
+                output = OUTPUT_FILE
+            written = True
+
+            if probe and unprobed:
+                probe.report_missing(unprobed)
+
+            if cache_key:
+                try:
+                    files = [shard_entry["file"] for shard_entry in index["shards"]] + [output] if shard else [output]
+                    self.build_cache.put(cache_key, files, output, image_block)
+                except OSError as e:
+                    logging.warning(f"Could not store the build in the cache: {e}")
+
+            if publish and not self._publish_output(output, messages, metrics):
+                return
+
+            metrics.finish()
+            metrics.write_jsonl(METRICS_FILE)
+            logging.info(f"Form submitted: {data['Configurator Name']!r}, {len(data['Sections'])} sections\n{metrics.summary_table()}")
+            if profile:
+                logging.info(f"Profile written to {PROFILE_FILE}")
+            messages.put(("done", output))
+        except GenerationCancelled:
+            metrics.finish()
+            logging.info("Form submission cancelled.")
+            messages.put(("cancelled",))
         except Exception as e:
+            metrics.finish()
             logging.error(f"Error submitting form: {e}")
-            messagebox.showerror("Error", f"Failed to submit form: {e}")
+            messages.put(("error", str(e)))
+        finally:
+            if image_block and image_block[1] and not written:
+                first_id, count = image_block
+                logging.warning(f"Image IDs {first_id}-{first_id + count - 1} were reserved but not used: "
+                                f"the run ended before the output was written")
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _publish_output(self, output, messages, metrics):
+        # The output is in place by now, so a failed upload is reported but not cancellable
+        from publish import Publisher, auth_from_env, describe_failed
+        with metrics.span("publish"):
+            failed = Publisher(os.environ[PUBLISH_URL_ENV], auth=auth_from_env()).failed(
+                [output], progress=lambda done, total: messages.put(("progress", done, total)))
+        if failed:
+            metrics.finish()
+            logging.error(describe_failed(failed))
+            messages.put(("error", f"{output} was written but not published.\n{describe_failed(failed)}"))
+            return False
+        return True
+
+    def _poll_generation(self):
+        try:
+            while True:
+                message = self._messages.get_nowait()
+                if message[0] == "progress":
+                    self.progress.config(value=message[1], maximum=message[2] or self.progress.cget("maximum"))
+                else:
+                    self._finish_generation(message)
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(PROGRESS_POLL_MS, self._poll_generation)
+
+    def _finish_generation(self, message):
+        self.submit_btn.config(state="normal")
+        self.open_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+        self.progress.config(value=0)
+
+        kind = message[0]
+        if self._loaded and self._loaded.file.closed:
+            if kind == "done":
+                self._reopen_loaded(message[1], self._submitted_rows)
+            else:
+                self._reopen_loaded(self._loaded.file.path)
+        if kind == "done" and message[2:] == ("cached",):
+            messagebox.showinfo("Success", f"Nothing changed since this form was last built: {message[1]} "
+                                           f"was restored from the build cache, no new image IDs were used.")
+        elif kind == "done":
+            messagebox.showinfo("Success", f"Form submitted successfully! Check {message[1]} for the output.")
+        elif kind == "cancelled":
+            messagebox.showinfo("Cancelled", "Generation cancelled. The previous output was left untouched.")
+        else:
+            messagebox.showerror("Error", f"Failed to submit form: {message[1]}")
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     root.geometry("800x600")  # Optional: set default window size
     app = ConfiguratorApp(root)
+    app.start_preload()
+    # after_idle runs once the window has been drawn; the after(0) inside lands on the next loop turn
+    root.after_idle(lambda: root.after(0, app.mark_interactive))
     root.mainloop()
@@ -0,0 +1,98 @@
+import cProfile
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FILE = "metrics.jsonl"
+
+
+class RunMetrics:
+    """Per-stage timings and counters for one configurator build.
+
+    Stage times are exclusive: time spent in a nested span is only counted
+    for the inner stage, so the stages add up to the run's total.
+    """
+
+    def __init__(self, name, profile=False, profile_path=None):
+        self.name = name
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.stages = {}  # stage -> [seconds, calls], in first-seen order
+        self.counters = {}
+        self.total = 0.0
+        self.profile_path = profile_path
+        self._profiler = cProfile.Profile() if profile else None
+        self._stack = []
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self._profiler:
+            self._profiler.enable()
+        return self
+
+    def finish(self):
+        if self._profiler:
+            self._profiler.disable()
+            if self.profile_path:
+                self._profiler.dump_stats(self.profile_path)
+        if self._start is not None:
+            self.total = time.perf_counter() - self._start
+        return self
+
+    @contextmanager
+    def span(self, stage):
+        frame = [time.perf_counter(), 0.0]  # start, time spent in nested spans
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            entry = self.stages.setdefault(stage, [0.0, 0])
+            entry[0] += elapsed - frame[1]
+            entry[1] += 1
+
+    def record(self, stage, seconds, calls=1):
+        # For stages timed outside a span, e.g. across threads or event-loop turns
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_record(self):
+        return {
+            "run": self.name,
+            "started": self.started,
+            "total_seconds": round(self.total, 6),
+            "stages": {stage: {"seconds": round(seconds, 6), "calls": calls}
+                       for stage, (seconds, calls) in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_jsonl(self, path=METRICS_FILE):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_record(), ensure_ascii=False) + "\n")
+
+    def summary_table(self):
+        lines = [f"{self.name}: {self.total * 1000:.1f} ms"]
+        for stage, (seconds, calls) in self.stages.items():
+            share = seconds / self.total * 100 if self.total else 0.0
+            lines.append(f"  {stage:<20} {seconds * 1000:>10.1f} ms {share:>5.1f}%  ({calls} calls)")
+        for counter, value in self.counters.items():
+            lines.append(f"  {counter:<20} {value:>10}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def null_span(stage):
+    yield
+
+
+def span_for(metrics):
+    # Lets hot loops call ``span(...)`` without checking for metrics each time
+    return metrics.span if metrics else null_span
@@ -0,0 +1,172 @@
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+# "Bleu-Canard-7g" -> weight 7; in mixes ("Bleu Lavande 12g Noir 318 1g") the first weight wins
+_WEIGHT = re.compile(r'(?<![0-9])(\d+(?:[.,]\d+)?)\s*g(?![a-z])', re.IGNORECASE)
+_TOKEN_SEPARATORS = re.compile(r'[-\s]+')
+_RGBA = re.compile(r'rgba\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*([\d.]+)\s*\)')
+
+QUERY_KEYS = ("family", "shade", "weight", "r", "g", "b")
+
+
+def parse_color_name(name):
+    """Split a palette color name into ``(family, shade, weight)``.
+
+    ``Bleu-Charette-15g`` gives ``("bleu", "bleu-charette", 15.0)``; family
+    and shade are case-folded, ``weight`` is ``None`` when the name has none.
+    """
+    match = _WEIGHT.search(name)
+    weight = float(match.group(1).replace(",", ".")) if match else None
+    shade = name[:match.start()] if match else name
+    shade = _TOKEN_SEPARATORS.sub("-", shade.strip(" -")).casefold()
+    family = shade.split("-", 1)[0]
+    return family, shade, weight
+
+
+def parse_rgba(rgba):
+    match = _RGBA.fullmatch(rgba.strip())
+    if not match:
+        raise ValueError(f"Invalid RGBA value: {rgba}")
+    r, g, b, a = match.groups()
+    return int(r), int(g), int(b), float(a)
+
+
+def _parse_range(key, value):
+    low, sep, high = value.partition("-")
+    try:
+        low = int(low) if low.strip() else 0
+        high = int(high) if sep and high.strip() else (255 if sep else low)
+    except ValueError:
+        raise ValueError(f"Invalid range for {key}: {value!r} (expected e.g. 0-128)")
+    return low, high
+
+
+def parse_query(text):
+    """Parse a color query such as ``family=Bleu,Vert; weight=7; b=128-255``.
+
+    Clauses are separated by ``;``, alternatives inside a clause by ``,``.
+    Returns keyword arguments for :meth:`PaletteIndex.select`.
+    """
+    query = {}
+    for clause in (text or "").split(";"):
+        if not clause.strip():
+            continue
+        key, sep, value = clause.partition("=")
+        key = key.strip().lower()
+        if not sep or key not in QUERY_KEYS:
+            raise ValueError(f"Invalid color query clause: {clause.strip()!r} "
+                             f"(expected one of {', '.join(QUERY_KEYS)} as key=value)")
+        if key in ("r", "g", "b"):
+            query[key] = _parse_range(key, value)
+        elif key == "weight":
+            try:
+                query[key] = [float(part.replace("g", "")) for part in value.split(",") if part.strip()]
+            except ValueError:
+                raise ValueError(f"Invalid weight in color query: {value!r}")
+        else:
+            query[key] = [part.strip() for part in value.split(",") if part.strip()]
+    return query
+
+
+class PaletteIndex:
+    """Palette colors indexed by family, shade, weight and RGB channel.
+
+    Lookups return positions in palette order, so a selection keeps the
+    order of the CSV.
+    """
+
+    def __init__(self, colors):
+        self.couleurs = tuple(couleur for couleur, rgba in colors)
+        self.rgbas = tuple(rgba for couleur, rgba in colors)
+        self.by_family = {}
+        self.by_shade = {}
+        self.by_weight = {}
+        channels = ([], [], [])
+
+        for position, (couleur, rgba) in enumerate(zip(self.couleurs, self.rgbas)):
+            family, shade, weight = parse_color_name(couleur)
+            self.by_family.setdefault(family, []).append(position)
+            self.by_shade.setdefault(shade, []).append(position)
+            if weight is not None:
+                self.by_weight.setdefault(weight, []).append(position)
+            try:
+                rgb = parse_rgba(rgba)[:3]
+            except ValueError:
+                continue  # never matched by an RGB range
+            for channel, value in zip(channels, rgb):
+                channel.append((value, position))
+
+        # Per channel: values sorted ascending, positions in the same order
+        self._channels = {}
+        for key, channel in zip("rgb", channels):
+            channel.sort()
+            self._channels[key] = ([value for value, position in channel], [position for value, position in channel])
+
+    def __len__(self):
+        return len(self.couleurs)
+
+    def _lookup(self, table, keys):
+        positions = set()
+        for key in keys:
+            positions.update(table.get(key, ()))
+        return positions
+
+    def _range(self, key, low, high):
+        values, positions = self._channels[key]
+        return set(positions[bisect_left(values, low):bisect_right(values, high)])
+
+    def positions(self, family=None, shade=None, weight=None, r=None, g=None, b=None):
+        """Return the sorted palette positions matching every given criterion."""
+        selected = None
+        criteria = [
+            (family, lambda: self._lookup(self.by_family, [value.casefold() for value in family])),
+            (shade, lambda: self._lookup(self.by_shade,
+                                         [_TOKEN_SEPARATORS.sub("-", value.strip()).casefold() for value in shade])),
+            (weight, lambda: self._lookup(self.by_weight, weight)),
+            (r, lambda: self._range("r", *r)),
+            (g, lambda: self._range("g", *g)),
+            (b, lambda: self._range("b", *b)),
+        ]
+        for value, lookup in criteria:
+            if value is None:
+                continue
+            matches = lookup()
+            selected = matches if selected is None else selected & matches
+            if not selected:
+                return []
+        if selected is None:
+            return list(range(len(self.couleurs)))
+        return sorted(selected)
+
+    def select(self, **query):
+        """Return ``{couleur: rgba}`` for the matching colors, in palette order."""
+        return {self.couleurs[position]: self.rgbas[position] for position in self.positions(**query)}
+
+
+@lru_cache(maxsize=8)
+def _index(colors):
+    return PaletteIndex(colors)
+
+
+def index_for(couleur_rgba_dict):
+    """Return the shared :class:`PaletteIndex` for a ``{couleur: rgba}`` mapping."""
+    return _index(tuple(couleur_rgba_dict.items()))
+
+
+@lru_cache(maxsize=256)
+def _select(colors, query_text):
+    return _index(colors).select(**parse_query(query_text))
+
+
+def select_colors(couleur_rgba_dict, query_text):
+    """Colors of the palette matching ``query_text``; the whole palette when the query is blank."""
+    if not query_text or not query_text.strip():
+        return couleur_rgba_dict
+    return dict(_select(tuple(couleur_rgba_dict.items()), query_text.strip()))
+
+
+def check_selection(couleur_rgba_dict, query_text):
+    """Raise ``ValueError`` when a color query is malformed or matches no palette color."""
+    if query_text and query_text.strip() and not select_colors(couleur_rgba_dict, query_text):
+        raise ValueError(f"color query {query_text.strip()!r} matches no palette colors")
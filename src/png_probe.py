@@ -0,0 +1,91 @@
+import logging
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from assemble import BASE_URL
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def read_png_size(path):
+    """Return ``(width, height)`` from the IHDR chunk, reading only the first 24 bytes."""
+    with open(path, 'rb') as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        raise ValueError(f"Not a PNG file: {path}")
+    return struct.unpack(">II", head[16:24])
+
+
+class PngProbe:
+    """Fills image width/height from a local mirror of the WordPress uploads folder.
+
+    ``https://.../wp-content/uploads/2025/08/x.png`` maps to
+    ``<mirror_root>/2025/08/x.png``. Sizes are cached by path and mtime.
+    """
+
+    def __init__(self, mirror_root, base_url=BASE_URL, workers=16):
+        self.mirror_root = mirror_root
+        self.base_url = base_url.rstrip("/")
+        self.workers = workers
+        self._cache = {}  # path -> (mtime_ns, (width, height))
+        self._lock = threading.Lock()
+
+    def local_path(self, url):
+        if not url or not url.startswith(self.base_url + "/"):
+            return None
+        relative = unquote(url[len(self.base_url) + 1:].split("?", 1)[0])
+        return os.path.join(self.mirror_root, *relative.split("/"))
+
+    def size_of(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            size = read_png_size(path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read PNG size of {path}: {e}")
+            return None
+        with self._lock:
+            self._cache[path] = (mtime, size)
+        return size
+
+    def probe(self, urls):
+        """Return ``{url: (width, height) or None}`` for every URL, probing files in parallel."""
+        paths = {url: self.local_path(url) for url in dict.fromkeys(urls)}
+        unique_paths = [path for path in dict.fromkeys(paths.values()) if path]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            sizes = dict(zip(unique_paths, executor.map(self.size_of, unique_paths)))
+        return {url: sizes.get(path) if path else None for url, path in paths.items()}
+
+    def fill_dimensions(self, group_layer_image, sections_data, warn=True):
+        """Overwrite width/height of the group layer and every child with the probed size.
+
+        Images without a local copy keep their typed-in values. Returns the
+        URLs that could not be probed; ``warn=False`` leaves reporting them
+        to the caller. ``group_layer_image`` may be ``None``.
+        """
+        entries = [group_layer_image] if group_layer_image else []
+        entries += [img for section in sections_data for img in section["children"]]
+        sizes = self.probe(entry["src"] for entry in entries)
+        missing = []
+        for entry in entries:
+            size = sizes.get(entry["src"])
+            if size:
+                entry["width"], entry["height"] = size
+            else:
+                missing.append(entry["src"])
+        if warn:
+            self.report_missing(missing)
+        return missing
+
+    def report_missing(self, missing):
+        if missing:
+            logging.warning(f"No local PNG for {len(dict.fromkeys(missing))} image(s) under {self.mirror_root}")
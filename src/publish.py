@@ -0,0 +1,234 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_pool import KeepAlivePool, describe_statuses
+from log_setup import setup_logging, summarize
+from shards import SHARD_INDEX_TYPE
+from publish_settings import PUBLISH_JOURNAL, PUBLISH_PASSWORD_ENV, PUBLISH_URL_ENV, PUBLISH_USER_ENV
+
+USER_AGENT = "wpc-configurator-publish/1.0"
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 60.0
+
+
+def auth_from_env():
+    user = os.environ.get(PUBLISH_USER_ENV)
+    if not user:
+        return None
+    return user, os.environ.get(PUBLISH_PASSWORD_ENV, "")
+
+
+def files_to_publish(paths):
+    """Expand ``paths`` into upload groups.
+
+    A shard index becomes its shards followed by the index itself, so the
+    site only sees the index once every shard has arrived. Shards named on
+    their own are dropped when their index is in ``paths`` too.
+    """
+    groups = []
+    owned = set()
+    for path in dict.fromkeys(paths):
+        if path.endswith(".index.json"):
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("type") == SHARD_INDEX_TYPE:
+                folder = os.path.dirname(path)
+                shards = [os.path.join(folder, entry["file"]) for entry in index["shards"]]
+                owned.update(os.path.abspath(shard) for shard in shards)
+                groups.append((shards, path))
+                continue
+        groups.append(([], path))
+    return [(shards, path) for shards, path in groups if shards or os.path.abspath(path) not in owned]
+
+
+class PublishJournal:
+    """Append-only record of finished uploads, one JSON object per line.
+
+    An upload counts as done for an endpoint, file and content hash, so a
+    rerun after a partial failure skips what already went through and a
+    regenerated file (new hash) is sent again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.done[(entry["endpoint"], entry["file"], entry["sha256"])] = entry["status"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # a line cut short by a crash
+
+    def status(self, endpoint, path, digest):
+        return self.done.get((endpoint, os.path.abspath(path), digest))
+
+    def record(self, endpoint, path, digest, status):
+        entry = {"endpoint": endpoint, "file": os.path.abspath(path), "sha256": digest, "status": status,
+                 "published_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with self._lock:
+            self.done[(endpoint, entry["file"], digest)] = status
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class Publisher:
+    """POSTs configurator files to a WordPress REST endpoint.
+
+    Connections are kept alive and pooled, at most ``concurrency`` uploads
+    run at once, transient failures (connection errors, 408/429/5xx) are
+    retried with backoff, and finished uploads go to a journal so a rerun
+    only sends what is still missing.
+    """
+
+    def __init__(self, endpoint, auth=None, concurrency=4, retries=3, timeout=60.0, backoff=1.0,
+                 journal_path=PUBLISH_JOURNAL):
+        try:
+            KeepAlivePool.split(endpoint)
+        except ValueError:
+            raise ValueError(f"Invalid publish endpoint: {endpoint}") from None
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.journal = PublishJournal(journal_path)
+        self.headers = {"User-Agent": USER_AGENT, "Content-Type": "application/json; charset=utf-8",
+                        "Accept": "application/json", "Connection": "keep-alive"}
+        if auth:
+            token = base64.b64encode(f"{auth[0]}:{auth[1]}".encode("utf-8")).decode("ascii")
+            self.headers["Authorization"] = f"Basic {token}"
+        self._pool = KeepAlivePool(timeout)
+
+    def _retry_delay(self, attempt, retry_after):
+        try:
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        except (TypeError, ValueError):
+            return self.backoff * (2 ** attempt)
+
+    def upload(self, path):
+        """Send one file; return its HTTP status, or ``None`` when the endpoint could not be reached."""
+        with open(path, 'rb') as f:
+            body = f.read()
+        digest = hashlib.sha256(body).hexdigest()
+        status = self.journal.status(self.endpoint, path, digest)
+        if status is not None:
+            logging.info(f"Already published {path} (HTTP {status}), skipping")
+            return status
+
+        # The hash lets the site ignore a repeat of an upload whose response was lost
+        headers = dict(self.headers, **{"X-WPC-File": os.path.basename(path), "X-WPC-Content-SHA256": digest})
+        payload = b""
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                status, response_headers, payload = self._pool.request("POST", self.endpoint, body, headers)
+                retry_after = response_headers.get("retry-after")
+                if status not in RETRY_STATUSES:
+                    break
+            except OSError as e:
+                if attempt == self.retries:
+                    logging.warning(f"Could not publish {path}: {e}")
+                    return None
+            if attempt < self.retries:
+                time.sleep(self._retry_delay(attempt, retry_after))
+
+        if 200 <= status < 300:
+            self.journal.record(self.endpoint, path, digest, status)
+            logging.info(f"Published {path} (HTTP {status})")
+        else:
+            logging.warning(f"Publishing {path} failed with HTTP {status}: "
+                            f"{summarize(payload.decode('utf-8', 'replace'), 500)}")
+        return status
+
+    def publish(self, paths, progress=None):
+        """Upload configurator files (or shard indexes) and return ``{file: status}``.
+
+        ``progress(done, total)`` is called after each file. An index is
+        only sent once all of its shards were accepted.
+        """
+        groups = files_to_publish(paths)
+        total = sum(len(shards) + 1 for shards, index in groups)
+        results = {}
+        done = 0
+
+        def finished(path, status):
+            nonlocal done
+            results[path] = status
+            done += 1
+            if progress:
+                progress(done, total)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = {executor.submit(self.upload, shard): shard for shards, index in groups for shard in shards}
+                for future in as_completed(futures):
+                    finished(futures[future], future.result())
+
+                ready = []
+                for shards, path in groups:
+                    if all(results[shard] is not None and 200 <= results[shard] < 300 for shard in shards):
+                        ready.append(path)
+                    else:
+                        logging.warning(f"Not publishing {path}: some of its shards failed")
+                        finished(path, None)
+                futures = {executor.submit(self.upload, path): path for path in ready}
+                for future in as_completed(futures):
+                    finished(futures[future], future.result())
+        finally:
+            self._pool.close_all()
+        return results
+
+    def failed(self, paths, progress=None):
+        """Return ``{file: status}`` for every file that was not accepted (status ``None`` when unreachable)."""
+        return {path: status for path, status in self.publish(paths, progress=progress).items()
+                if status is None or not 200 <= status < 300}
+
+
+def describe_failed(failed, limit=10):
+    return describe_statuses(failed, "file(s) not published", limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload configurator JSON files to a WordPress REST endpoint.")
+    parser.add_argument("files", nargs="+", help="Configurator JSON files or shard indexes (*.index.json)")
+    parser.add_argument("--endpoint", default=os.environ.get(PUBLISH_URL_ENV),
+                        help=f"REST endpoint URL (default: ${PUBLISH_URL_ENV})")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="Uploads running at once")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per file for connection errors and 408/429/5xx")
+    parser.add_argument("--journal", default=PUBLISH_JOURNAL,
+                        help="Journal of finished uploads; files recorded there with the same content are skipped")
+    args = parser.parse_args(argv)
+
+    setup_logging(log_file=None, console=True)
+    if not args.endpoint:
+        logging.error(f"No endpoint: pass --endpoint or set {PUBLISH_URL_ENV}")
+        return 2
+
+    try:
+        publisher = Publisher(args.endpoint, auth=auth_from_env(), concurrency=args.concurrency,
+                              retries=args.retries, journal_path=args.journal)
+        failed = publisher.failed(args.files)
+    except Exception as e:
+        logging.error(f"Publish failed: {e}")
+        return 1
+    if failed:
+        logging.error(describe_failed(failed) + "\nRun again to retry; files already published are skipped.")
+        return 1
+    print(f"✅ Published to {args.endpoint}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
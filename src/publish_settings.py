@@ -0,0 +1,7 @@
+# Endpoint and credentials come from the environment so passwords stay out of argv and the GUI;
+# the password is a WordPress application password for PUBLISH_USER_ENV. Kept apart from
+# publish.py so the GUI can read them at startup without importing http.client.
+PUBLISH_URL_ENV = "WPC_PUBLISH_URL"
+PUBLISH_USER_ENV = "WPC_PUBLISH_USER"
+PUBLISH_PASSWORD_ENV = "WPC_PUBLISH_PASSWORD"
+PUBLISH_JOURNAL = "publish_journal.jsonl"
@@ -1,6 +1,86 @@
 import csv
 import logging
 import os
+import threading
+from types import MappingProxyType
+
+
+class Palette:
+    """Immutable, ordered view of a palette CSV.
+
+    ``names`` and ``rgbas`` keep every row in file order (duplicates included),
+    ``lookup`` maps each color name to its RGBA value.
+    """
+
+    __slots__ = ("path", "names", "rgbas", "lookup", "_stamp")
+
+    def __init__(self, path, names, rgbas, stamp):
+        lookup = {}
+        for couleur, rgba in zip(names, rgbas):
+            lookup[couleur] = rgba
+        object.__setattr__(self, "path", path)
+        object.__setattr__(self, "names", tuple(names))
+        object.__setattr__(self, "rgbas", tuple(rgbas))
+        object.__setattr__(self, "lookup", MappingProxyType(lookup))
+        object.__setattr__(self, "_stamp", stamp)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Palette is immutable")
+
+    def __len__(self):
+        return len(self.lookup)
+
+    def items(self):
+        return self.lookup.items()
+
+
+_palette_cache = {}
+_palette_lock = threading.Lock()
+
+
+def _file_stamp(file_path):
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_palette(file_path, delimiter, stamp):
+    names = []
+    rgbas = []
+    with open(file_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+        try:
+            reader = csv.DictReader(csvfile, delimiter=delimiter)
+            logging.debug(f"Detected columns: {reader.fieldnames}")
+
+            # Check if required columns exist
+            if not reader.fieldnames or 'Couleur' not in reader.fieldnames or 'RGBA' not in reader.fieldnames:
+                raise KeyError("CSV must contain 'Couleur' and 'RGBA' columns.")
+
+            for row in reader:
+                names.append(str(row['Couleur']).strip())
+                rgbas.append(str(row['RGBA']).strip())
+
+        except csv.Error as e:
+            logging.error(f"CSV parsing error: {e}")
+            raise ValueError(f"CSV parsing error: {e}")
+
+    logging.info(f"Successfully read {len(names)} color entries from {file_path}")
+    return Palette(file_path, names, rgbas, stamp)
+
+
+def get_palette(file_path, delimiter=';'):
+    """Return the shared palette for ``file_path``, re-reading it only when its mtime or size changed."""
+    key = (os.path.abspath(file_path), delimiter)
+    try:
+        stamp = _file_stamp(file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    with _palette_lock:
+        palette = _palette_cache.get(key)
+        if palette is None or palette._stamp != stamp:
+            palette = _parse_palette(file_path, delimiter, stamp)
+            _palette_cache[key] = palette
+        return palette
 
 
 def read_color_csv(file_path, delimiter=';'):
@@ -9,31 +89,10 @@ def read_color_csv(file_path, delimiter=';'):
     couleur_rgba_dict = {}
 
     try:
-        # Check if file exists
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-
-        with open(file_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
-            try:
-                reader = csv.DictReader(csvfile, delimiter=delimiter)
-                print("Detected columns:", reader.fieldnames)
-
-                # Check if required columns exist
-                if 'Couleur' not in reader.fieldnames or 'RGBA' not in reader.fieldnames:
-                    raise KeyError("CSV must contain 'Couleur' and 'RGBA' columns.")
-
-                for row in reader:
-                    couleur = str(row['Couleur']).strip()
-                    rgba = str(row['RGBA']).strip()
-                    couleur_list.append(couleur)
-                    rgba_color_list.append(rgba)
-                    couleur_rgba_dict[couleur] = rgba  # ✅ key-value pair
-
-                logging.info(f"Successfully read {len(couleur_list)} color entries from {file_path}")
-
-            except csv.Error as e:
-                logging.error(f"CSV parsing error: {e}")
-                raise ValueError(f"CSV parsing error: {e}")
+        palette = get_palette(file_path, delimiter)
+        couleur_list = list(palette.names)
+        rgba_color_list = list(palette.rgbas)
+        couleur_rgba_dict = dict(palette.lookup)  # ✅ key-value pair
 
     except FileNotFoundError as e:
         logging.error(e)
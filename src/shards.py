@@ -0,0 +1,71 @@
+import glob
+import json
+import os
+import re
+
+SHARD_TYPE = "amz_configurator_shard"
+SHARD_INDEX_TYPE = "amz_configurator_index"
+SHARD_KEY = "shard"
+
+
+def _stem(filename):
+    root, ext = os.path.splitext(filename)
+    return root if ext.lower() == ".json" else filename
+
+
+def shard_path(filename, number):
+    # configurator.json -> configurator-001.json
+    return f"{_stem(filename)}-{number:03d}.json"
+
+
+def index_path(filename):
+    # configurator.json -> configurator.index.json
+    return f"{_stem(filename)}.index.json"
+
+
+def parse_size(text):
+    """``"2M"`` -> 2097152; plain numbers are bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMG".index(unit.upper() or " "))
+
+
+def remove_stale_shards(filename, keep):
+    """Delete shards numbered above ``keep`` left over from a larger previous export."""
+    pattern = re.compile(re.escape(os.path.basename(_stem(filename))) + r"-(\d{3,})\.json$")
+    for path in glob.glob(glob.escape(_stem(filename)) + "-*.json"):
+        match = pattern.match(os.path.basename(path))
+        if match and int(match.group(1)) > keep:
+            os.remove(path)
+
+
+def load_sharded(index_file):
+    """Reassemble the full configurator document from an index written by ``save_sharded``."""
+    with open(index_file, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get("type") != SHARD_INDEX_TYPE:
+        raise ValueError(f"{index_file} is not a configurator shard index")
+
+    folder = os.path.dirname(index_file)
+    components = []
+    editor_images = {}
+    for number, entry in enumerate(index["shards"], start=1):
+        with open(os.path.join(folder, entry["file"]), 'r', encoding='utf-8') as f:
+            shard = json.load(f)
+        if shard.get("type") != SHARD_TYPE or shard.get(SHARD_KEY) != number:
+            raise ValueError(f"{entry['file']} is not shard {number} of {index_file}")
+        components.extend(shard["settings"]["_wpc_components"])
+        editor_images.update(shard["settings"]["_wpc_editor_images"])
+
+    # Components and editor images go back between the head and tail settings, as generate() orders them
+    settings = {}
+    for key, value in index["settings"].items():
+        if key == "_wpc_custom_js":
+            settings["_wpc_components"] = components
+            settings["_wpc_editor_images"] = editor_images
+        settings[key] = value
+    settings.setdefault("_wpc_components", components)
+    settings.setdefault("_wpc_editor_images", editor_images)
+    return {"title": index["title"], "type": "amz_configurator", "settings": settings}
@@ -0,0 +1,42 @@
+import re
+from functools import lru_cache
+
+# Any run of characters outside [A-Za-z0-9_] (dashes included) collapses to a
+# single dash, which is what the former whitespace / invalid-char / repeated-dash
+# passes produced together.
+_SEPARATORS = re.compile(r'[^A-Za-z0-9_]+')
+
+SLUG_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=SLUG_CACHE_SIZE)
+def _slugify(name):
+    return _SEPARATORS.sub('-', name.replace(',', '').strip())
+
+
+def make_valid_url(name):
+    if name:
+        return _slugify(name)
+    else:
+        print("make_valid_url Error: No FIle name")
+
+
+def color_suffix(couleur, product_type):
+    # File name suffix shared by every section using this color and product type
+    return make_valid_url(f"-{couleur}-{product_type}")
+
+
+def slug_matrix(couleurs, product_types):
+    """Slug every palette color for every product type at once.
+
+    Returns ``{product_type: [suffix, ...]}`` with suffixes in palette order.
+    """
+    couleurs = list(couleurs)
+    return {
+        product_type: [color_suffix(couleur, product_type) for couleur in couleurs]
+        for product_type in dict.fromkeys(product_types)
+    }
+
+
+def cache_info():
+    return _slugify.cache_info()
@@ -0,0 +1,92 @@
+import hashlib
+import os
+
+
+def _format_uid(hex8):
+    return hex8[:4] + "-" + hex8[4:8]
+
+
+class RandomUidProvider:
+    """Random ``xxxx-xxxx`` UIDs drawn from one ``os.urandom`` call per batch."""
+
+    depends_on_title = False
+
+    def __init__(self, batch_size=4096):
+        self.batch_size = batch_size
+        self._pool = b""
+        self._offset = 0
+        self._issued = set()
+
+    def _draw(self):
+        if self._offset + 4 > len(self._pool):
+            self._pool = os.urandom(4 * self.batch_size)
+            self._offset = 0
+        chunk = self._pool[self._offset:self._offset + 4]
+        self._offset += 4
+        return _format_uid(chunk.hex())
+
+    def claim(self, uid, *key):
+        # Register a UID that was assigned elsewhere (e.g. a previous build)
+        self._issued.add(uid)
+        return uid
+
+    def uid(self, *key):
+        uid = self._draw()
+        while uid in self._issued:
+            uid = self._draw()
+        self._issued.add(uid)
+        return uid
+
+
+class DeterministicUidProvider:
+    """UIDs derived from a hash of the key (configurator title, section, color).
+
+    The same key always maps to the same UID, so rebuilding unchanged input
+    gives identical output. Two different keys that hash to the same UID are
+    told apart by re-hashing with a counter.
+    """
+
+    depends_on_title = True
+
+    def __init__(self):
+        self._by_key = {}
+        self._owner = {}
+
+    def claim(self, uid, *key):
+        key = tuple(str(part) for part in key)
+        self._owner[uid] = key
+        self._by_key[key] = uid
+        return uid
+
+    def uid(self, *key):
+        key = tuple(str(part) for part in key)
+        uid = self._by_key.get(key)
+        if uid is not None:
+            return uid
+
+        material = "\x1f".join(key)
+        attempt = 0
+        while True:
+            salt = f"\x1f#{attempt}" if attempt else ""
+            digest = hashlib.blake2b((material + salt).encode("utf-8"), digest_size=4).hexdigest()
+            uid = _format_uid(digest)
+            if uid not in self._owner:
+                break
+            attempt += 1
+
+        self._owner[uid] = key
+        self._by_key[key] = uid
+        return uid
+
+
+UID_PROVIDERS = {
+    "random": RandomUidProvider,
+    "deterministic": DeterministicUidProvider,
+}
+
+
+def make_uid_provider(mode="random"):
+    try:
+        return UID_PROVIDERS[mode]()
+    except KeyError:
+        raise ValueError(f"Unknown UID mode: {mode}")
@@ -0,0 +1,82 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from http_pool import KeepAlivePool, describe_statuses
+
+USER_AGENT = "wpc-configurator-verify/1.0"
+MAX_REDIRECTS = 3
+
+
+class AssetVerifier:
+    """Checks that image URLs exist with concurrent ``HEAD`` requests.
+
+    Connections are kept alive and pooled per host, at most ``concurrency``
+    requests run at once, transient failures are retried with backoff, and
+    URLs found (2xx) are cached for the lifetime of the verifier. Other
+    answers are asked again next time, so an image uploaded after a failed
+    check is picked up without restarting.
+    """
+
+    def __init__(self, concurrency=16, retries=2, timeout=10.0, backoff=0.5):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.cache = {}  # url -> 2xx HTTP status
+        self._pool = KeepAlivePool(timeout)
+
+    def _check(self, url):
+        if url in self.cache:
+            return self.cache[url]
+
+        status = None
+        headers = {"User-Agent": USER_AGENT, "Connection": "keep-alive"}
+        for attempt in range(self.retries + 1):
+            try:
+                target = url
+                for _ in range(MAX_REDIRECTS + 1):
+                    status, response_headers, payload = self._pool.request("HEAD", target, headers=headers)
+                    if status in (301, 302, 303, 307, 308) and response_headers.get("location"):
+                        target = urljoin(target, response_headers["location"])
+                        continue
+                    break
+                if status < 500:
+                    break
+            except (OSError, ValueError) as e:
+                if isinstance(e, ValueError) or attempt == self.retries:
+                    logging.warning(f"Could not check {url}: {e}")
+                    return None
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt))
+
+        if status is not None and 200 <= status < 300:
+            self.cache[url] = status
+        return status
+
+    def verify(self, urls):
+        """Return ``{url: status}``; status is ``None`` when the server could not be reached."""
+        unique = list(dict.fromkeys(urls))
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                statuses = list(executor.map(self._check, unique))
+        finally:
+            self._pool.close_all()
+        return dict(zip(unique, statuses))
+
+    def missing(self, urls):
+        """Return ``{url: status}`` for every URL that is not a 2xx response."""
+        return {url: status for url, status in self.verify(urls).items()
+                if status is None or not 200 <= status < 300}
+
+
+def collect_image_urls(group_layer_image, sections_data):
+    urls = [group_layer_image["src"]] if group_layer_image.get("src") else []
+    for section in sections_data:
+        urls.extend(img["src"] for img in section["children"])
+    return urls
+
+
+def describe_missing(missing, limit=10):
+    return describe_statuses(missing, "image(s) not found", limit)
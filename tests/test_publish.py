@@ -0,0 +1,90 @@
+import json
+
+from conftest import QuietHandler
+from publish import Publisher
+from shards import SHARD_INDEX_TYPE
+
+
+class EndpointHandler(QuietHandler):
+    received = []  # X-WPC-File of every accepted upload, in order
+    calls = {}
+    fail_once = set()
+    always_fail = set()
+
+    def do_POST(self):
+        name = self.headers["X-WPC-File"]
+        self.rfile.read(int(self.headers["Content-Length"]))
+        cls = type(self)
+        cls.calls[name] = cls.calls.get(name, 0) + 1
+        if name in cls.always_fail or (name in cls.fail_once and cls.calls[name] == 1):
+            self.reply(503)
+        else:
+            cls.received.append(name)
+            self.reply(201, b"{}", [("Content-Type", "application/json")])
+
+
+def endpoint_handler(fail_once=(), always_fail=()):
+    return type("Endpoint", (EndpointHandler,), {"received": [], "calls": {},
+                                                 "fail_once": set(fail_once), "always_fail": set(always_fail)})
+
+
+def write_sharded(folder, name, shard_count):
+    shards = []
+    for number in range(1, shard_count + 1):
+        shard = folder / f"{name}.part{number}.json"
+        shard.write_text(json.dumps({"Sections": [number]}), encoding="utf-8")
+        shards.append({"file": shard.name})
+    index = folder / f"{name}.index.json"
+    index.write_text(json.dumps({"type": SHARD_INDEX_TYPE, "shards": shards}), encoding="utf-8")
+    return str(index)
+
+
+def publisher(url, tmp_path):
+    return Publisher(url + "/wp-json/wpc/v1/configurators", concurrency=4, retries=2, backoff=0.01,
+                     timeout=2.0, journal_path=str(tmp_path / "journal.jsonl"))
+
+
+def test_5xx_is_retried(serve, tmp_path):
+    handler = endpoint_handler(fail_once={"a.json"})
+    path = tmp_path / "a.json"
+    path.write_text("{}", encoding="utf-8")
+
+    assert publisher(serve(handler), tmp_path).failed([str(path)]) == {}
+    assert handler.calls == {"a.json": 2}
+
+
+def test_journal_resumes_after_partial_failure(serve, tmp_path):
+    handler = endpoint_handler(always_fail={"b.json"})
+    url = serve(handler)
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    a.write_text('{"a": 1}', encoding="utf-8")
+    b.write_text('{"b": 1}', encoding="utf-8")
+
+    assert publisher(url, tmp_path).failed([str(a), str(b)]) == {str(b): 503}
+
+    handler.always_fail.clear()
+    assert publisher(url, tmp_path).failed([str(a), str(b)]) == {}
+    assert handler.received == ["a.json", "b.json"]  # a.json was not sent twice
+
+    a.write_text('{"a": 2}', encoding="utf-8")
+    assert publisher(url, tmp_path).failed([str(a)]) == {}
+    assert handler.received[-1] == "a.json"  # changed content is sent again
+
+
+def test_shards_are_sent_before_their_index(serve, tmp_path):
+    handler = endpoint_handler()
+    index = write_sharded(tmp_path, "big", 3)
+
+    assert publisher(serve(handler), tmp_path).failed([index]) == {}
+    assert sorted(handler.received[:3]) == ["big.part1.json", "big.part2.json", "big.part3.json"]
+    assert handler.received[3:] == ["big.index.json"]
+
+
+def test_index_is_held_back_when_a_shard_fails(serve, tmp_path):
+    handler = endpoint_handler(always_fail={"big.part2.json"})
+    index = write_sharded(tmp_path, "big", 3)
+
+    failed = publisher(serve(handler), tmp_path).failed([index])
+
+    assert failed == {str(tmp_path / "big.part2.json"): 503, index: None}
+    assert "big.index.json" not in handler.calls
@@ -0,0 +1,43 @@
+from conftest import QuietHandler
+from verify_assets import AssetVerifier
+
+
+class AssetsHandler(QuietHandler):
+    flaky_calls = 0
+
+    def do_HEAD(self):
+        if self.path == "/ok.png":
+            self.reply(200)
+        elif self.path == "/flaky.png":
+            type(self).flaky_calls += 1
+            self.reply(503 if type(self).flaky_calls == 1 else 200)
+        elif self.path == "/moved.png":
+            self.reply(301, headers=[("Location", "/ok.png")])
+        else:
+            self.reply(404)
+
+
+def test_statuses_against_local_server(serve, closed_port):
+    base = serve(AssetsHandler)
+    unreachable = f"http://127.0.0.1:{closed_port}/gone.png"
+    verifier = AssetVerifier(retries=2, backoff=0.01, timeout=2.0)
+
+    statuses = verifier.verify([f"{base}/ok.png", f"{base}/missing.png", f"{base}/flaky.png",
+                                f"{base}/moved.png", unreachable])
+
+    assert statuses == {
+        f"{base}/ok.png": 200,
+        f"{base}/missing.png": 404,
+        f"{base}/flaky.png": 200,
+        f"{base}/moved.png": 200,
+        unreachable: None,
+    }
+    assert AssetsHandler.flaky_calls == 2
+
+
+def test_only_found_images_are_cached(serve):
+    base = serve(AssetsHandler)
+    verifier = AssetVerifier(retries=0)
+
+    assert verifier.missing([f"{base}/ok.png", f"{base}/missing.png"]) == {f"{base}/missing.png": 404}
+    assert verifier.cache == {f"{base}/ok.png": 200}